@@ -1,15 +1,22 @@
 # api/main.py
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any, Literal
+import asyncio
+import json
 import sys
 import os
 
 # Add parent directory to path to import services
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Try to import the main chat service, fallback to the version without Neo4j
+import config
+
+# Try to import the main chat service, fallback to the version without Neo4j.
+# Both construct their heavy components lazily; warmup happens at startup and
+# ChatService itself degrades to the local graph if Neo4j is unreachable.
 try:
     from services.chat_service import chat_service
     print("✅ Using full chat service with Neo4j")
@@ -17,6 +24,15 @@ except Exception as e:
     print(f"⚠️ Neo4j not available, using fallback service: {e}")
     from services.chat_service_fallback import chat_service_fallback as chat_service
 
+from services.concurrency import run_blocking, shutdown_executor
+from services import metrics
+
+WARMUP_ON_STARTUP = getattr(config, "WARMUP_ON_STARTUP", True)
+WARMUP_RETRY_BASE = getattr(config, "WARMUP_RETRY_BASE", 1.0)
+WARMUP_RETRY_MAX = getattr(config, "WARMUP_RETRY_MAX", 60.0)
+BATCH_MAX_QUERIES = getattr(config, "BATCH_MAX_QUERIES", 100)
+SEARCH_MAX_TOP_K = getattr(config, "SEARCH_MAX_TOP_K", 100)
+
 app = FastAPI(
     title="Hybrid Chat API",
     description="API for Vietnam Travel Hybrid RAG System",
@@ -30,24 +46,73 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 # Pydantic models
+class SearchFilters(BaseModel):
+    # AND across fields, OR within a field; tags match if any tag matches
+    type: Optional[List[Literal["City", "Attraction", "Hotel", "Activity"]]] = None
+    city: Optional[List[str]] = None
+    region: Optional[List[str]] = None
+    tags: Optional[List[str]] = None
+
+    def to_dict(self) -> Dict[str, List[str]]:
+        return self.model_dump(exclude_none=True)
+
 class ChatRequest(BaseModel):
     query: str
+    filters: Optional[SearchFilters] = None
+    # add a per-stage latency breakdown (milliseconds) to the response
+    include_timings: bool = False
 
 class SearchRequest(BaseModel):
     query: str
-    top_k: Optional[int] = 5
+    top_k: int = Field(5, ge=1, le=SEARCH_MAX_TOP_K)
+    # "dense" (vector), "lexical" (BM25) or "hybrid" (rank fusion); None = server default
+    mode: Optional[Literal["dense", "lexical", "hybrid"]] = None
+    filters: Optional[SearchFilters] = None
 
 class ChatResponse(BaseModel):
     answer: str
     matches: List[Dict[str, Any]]
     graph_facts: List[Dict[str, Any]]
+    context_tokens: Optional[int] = None
+    timings: Optional[Dict[str, float]] = None
 
 class SearchResponse(BaseModel):
     matches: List[Dict[str, Any]]
 
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_QUERIES)
+    top_k: int = Field(5, ge=1, le=SEARCH_MAX_TOP_K)
+    mode: Optional[Literal["dense", "lexical", "hybrid"]] = None
+    filters: Optional[SearchFilters] = None
+
+class BatchChatRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_QUERIES)
+    filters: Optional[SearchFilters] = None
+
+# Batch items carry either a result or an `error`, in request order
+class BatchSearchItem(BaseModel):
+    query: str
+    matches: Optional[List[Dict[str, Any]]] = None
+    error: Optional[str] = None
+
+class BatchChatItem(BaseModel):
+    query: str
+    answer: Optional[str] = None
+    matches: Optional[List[Dict[str, Any]]] = None
+    graph_facts: Optional[List[Dict[str, Any]]] = None
+    context_tokens: Optional[int] = None
+    error: Optional[str] = None
+
+class BatchSearchResponse(BaseModel):
+    results: List[BatchSearchItem]
+
+class BatchChatResponse(BaseModel):
+    results: List[BatchChatItem]
+
 class GraphResponse(BaseModel):
     nodes: List[Dict[str, Any]]
     edges: List[Dict[str, Any]]
@@ -72,6 +137,22 @@ async def health_check():
         message="Service is healthy"
     )
 
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness probe: 200 once every dependency is warmed up, 503 until then."""
+    state = chat_service.readiness()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
+
+@app.get("/api/stats")
+async def stats():
+    """Cache hit/miss counters."""
+    return chat_service.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Per-stage latency histograms, error counters and size gauges (Prometheus text format)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """Process a chat query and return answer with context."""
@@ -79,19 +160,54 @@ async def chat(request: ChatRequest):
         if not request.query.strip():
             raise HTTPException(status_code=400, detail="Query cannot be empty")
         
-        result = chat_service.process_query(request.query)
+        filters = request.filters.to_dict() if request.filters else None
+        if request.include_timings:
+            result, timings = await run_blocking(
+                metrics.with_timings, chat_service.process_query, request.query, filters=filters
+            )
+            return ChatResponse(**result, timings=timings)
+        result = await run_blocking(chat_service.process_query, request.query, filters=filters)
         return ChatResponse(**result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Stream a chat answer as Server-Sent Events.
+
+    Emits one ``context`` event with matches and graph facts as soon as
+    retrieval finishes, then ``token`` events as the LLM produces text,
+    then ``done`` (or ``error``).
+    """
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+
+    filters = request.filters.to_dict() if request.filters else None
+
+    async def event_source():
+        try:
+            async for event, data in chat_service.astream_query(request.query, filters=filters):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': f'Error processing query: {str(e)}'})}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/api/search", response_model=SearchResponse)
 async def search(request: SearchRequest):
-    """Search for similar content using vector similarity."""
+    """Search for similar content using vector, keyword (BM25) or hybrid retrieval."""
     try:
         if not request.query.strip():
             raise HTTPException(status_code=400, detail="Query cannot be empty")
         
-        matches = chat_service.pinecone_query(request.query, top_k=request.top_k)
+        filters = request.filters.to_dict() if request.filters else None
+        matches = await run_blocking(
+            chat_service.search, request.query, top_k=request.top_k, mode=request.mode, filters=filters
+        )
         formatted_matches = [
             {
                 "id": m["id"],
@@ -104,9 +220,46 @@ async def search(request: SearchRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching: {str(e)}")
 
+async def run_batch(fn, queries: List[str], **kwargs) -> List[Dict[str, Any]]:
+    """Run a batch service call on the non-empty queries; empty ones become per-item errors."""
+    results = [{"error": "Query cannot be empty"} for _ in queries]
+    valid = [i for i, q in enumerate(queries) if q.strip()]
+    if valid:
+        out = await run_blocking(fn, [queries[i] for i in valid], **kwargs)
+        for i, item in zip(valid, out):
+            results[i] = item
+    return [{"query": q, **item} for q, item in zip(queries, results)]
+
+@app.post("/api/search/batch", response_model=BatchSearchResponse)
+async def search_batch(request: BatchSearchRequest):
+    """Search many queries at once: one batched encode and bulk vector lookups."""
+    try:
+        filters = request.filters.to_dict() if request.filters else None
+        results = await run_batch(
+            chat_service.search_batch, request.queries, top_k=request.top_k, mode=request.mode, filters=filters
+        )
+        return BatchSearchResponse(results=results)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching: {str(e)}")
+
+@app.post("/api/chat/batch", response_model=BatchChatResponse)
+async def chat_batch(request: BatchChatRequest):
+    """Answer many queries at once; retrieval and graph expansion are shared, LLM calls bounded."""
+    try:
+        filters = request.filters.to_dict() if request.filters else None
+        results = await run_batch(chat_service.process_batch, request.queries, filters=filters)
+        return BatchChatResponse(results=results)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing batch: {str(e)}")
+
 @app.get("/api/graph/byIds", response_model=GraphResponse)
-async def get_graph_data(ids: str):
-    """Get graph data for visualization by node IDs."""
+async def get_graph_data(ids: str, request: Request, response: Response):
+    """Get graph data for visualization by node IDs.
+
+    Responses carry an ETag derived from the id set and the graph load
+    version; a matching If-None-Match is answered with 304 without
+    touching Neo4j.
+    """
     try:
         if not ids:
             raise HTTPException(status_code=400, detail="Node IDs are required")
@@ -115,14 +268,45 @@ async def get_graph_data(ids: str):
         if not node_ids:
             raise HTTPException(status_code=400, detail="No valid node IDs provided")
         
-        result = chat_service.get_graph_data(node_ids)
+        etag = await run_blocking(chat_service.graph_etag, node_ids)
+        cache_headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=cache_headers)
+
+        result = await run_blocking(chat_service.get_graph_data, node_ids)
+        response.headers.update(cache_headers)
         return GraphResponse(**result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching graph data: {str(e)}")
 
+async def warm_until_ready():
+    """Run warmup until every component is ready, backing off between attempts
+    (WARMUP_RETRY_BASE doubling up to WARMUP_RETRY_MAX seconds)."""
+    delay = WARMUP_RETRY_BASE
+    while True:
+        state = await run_blocking(chat_service.warmup)
+        if state["ready"]:
+            return state
+        failed = [name for name, c in state["components"].items() if c["error"]]
+        print(f"⚠️ Warmup incomplete ({', '.join(failed)}), retrying in {delay:.0f}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, WARMUP_RETRY_MAX)
+
+@app.on_event("startup")
+async def startup_event():
+    """Warm up the model and backends in the background so the server binds immediately."""
+    if WARMUP_ON_STARTUP:
+        app.state.warmup = asyncio.create_task(warm_until_ready())
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Clean up resources on shutdown."""
+    warmup = getattr(app.state, "warmup", None)
+    if warmup is not None:
+        warmup.cancel()
+    await chat_service.aclose()
+    shutdown_executor(wait=False)
     chat_service.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,96 @@
+# benchmarks/__main__.py
+# Offline benchmarks (no Pinecone, Neo4j or LLM credentials needed):
+#
+#   python -m benchmarks run [--out benchmarks/baselines/local.json]
+#   python -m benchmarks compare benchmarks/baselines/local.json [--current new.json]
+#
+# `compare` without --current runs the suite now (with the baseline's
+# settings unless overridden) and exits non-zero if any scenario regressed.
+
+import argparse
+import json
+import sys
+
+from benchmarks import suite
+
+
+def _print_report(report):
+    print(f"{'scenario':<36}{'iter':>6}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, r in report["results"].items():
+        print(f"{name:<36}{r['iterations']:>6}{r['throughput_per_s'] or '-':>10}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}")
+
+
+def _run(args):
+    return suite.run_suite(
+        iterations=args.iterations,
+        llm_latency_ms=args.llm_latency_ms,
+        backend_latency_ms=args.backend_latency_ms,
+        embed_latency_ms=args.embed_latency_ms,
+        ingest_iterations=args.ingest_iterations,
+        only=args.only
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    def add_run_options(p):
+        p.add_argument("--iterations", type=int)
+        p.add_argument("--ingest-iterations", type=int, default=3)
+        p.add_argument("--llm-latency-ms", type=float)
+        p.add_argument("--backend-latency-ms", type=float, help="added per Pinecone/Neo4j request")
+        p.add_argument("--embed-latency-ms", type=float, help="added per embedder.encode call")
+        p.add_argument("--only", nargs="*", help="scenario name prefixes to run")
+
+    run_p = sub.add_parser("run", help="run the suite and optionally store a JSON baseline")
+    add_run_options(run_p)
+    run_p.add_argument("--out", help="write the report to this JSON file")
+
+    cmp_p = sub.add_parser("compare", help="compare against a baseline and flag regressions")
+    cmp_p.add_argument("baseline")
+    cmp_p.add_argument("--current", help="report to compare (default: run the suite now)")
+    cmp_p.add_argument("--threshold", type=float, default=suite.DEFAULT_THRESHOLD,
+                       help="relative slowdown counted as a regression (default 0.20)")
+    cmp_p.add_argument("--out", help="also write the current report here")
+    add_run_options(cmp_p)
+
+    args = parser.parse_args(argv)
+    baseline = suite.load(args.baseline) if args.cmd == "compare" else None
+    # unset options: the baseline's settings when comparing, else the defaults
+    meta = baseline.get("meta", {}) if baseline else {}
+    for key, default in suite.RUN_DEFAULTS.items():
+        if getattr(args, key) is None:
+            setattr(args, key, meta.get(key, default))
+
+    if args.cmd == "run":
+        report = _run(args)
+        _print_report(report)
+        if args.out:
+            suite.save(report, args.out)
+            print(f"Wrote {args.out}")
+        return 0
+
+    if args.current:
+        current = suite.load(args.current)
+    else:
+        current = _run(args)
+        _print_report(current)
+    if args.out:
+        suite.save(current, args.out)
+
+    rows = suite.compare(baseline, current, threshold=args.threshold)
+    regressions = [r for r in rows if r["regression"]]
+    print(f"\n{'scenario':<36}{'metric':<18}{'baseline':>10}{'current':>10}{'change':>9}")
+    for r in rows:
+        flag = "  REGRESSION" if r["regression"] else ""
+        print(f"{r['scenario']:<36}{r['metric']:<18}{r['baseline']:>10}{r['current']:>10}{r['change_pct']:>8}%{flag}")
+    print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%} across {len(rows)} comparisons")
+    if regressions:
+        print(json.dumps(regressions, indent=2), file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
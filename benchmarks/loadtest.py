@@ -0,0 +1,354 @@
+# benchmarks/loadtest.py
+# HTTP load generator for api.main:app. Drives /api/chat, /api/search and
+# /api/graph/byIds with a weighted query mix built from the dataset, in
+# closed-loop (N concurrent users) or open-loop (fixed arrival rate) mode.
+#
+#   python -m benchmarks.loadtest --mode closed --concurrency 1,4,16,64 --duration 10
+#   python -m benchmarks.loadtest --mode open --rate 20,50,100 --transport localhost
+#   python -m benchmarks.loadtest --url http://staging:8000 --mode open --rate 10
+#
+# By default the app runs in-process (httpx ASGITransport) with its chat
+# service replaced by the benchmark stand-ins; --transport localhost serves
+# the same stubbed app with uvicorn on 127.0.0.1, and --url targets an
+# already running server as-is. Each step reports a latency histogram,
+# throughput, error rate and event-loop lag.
+
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import Counter
+from typing import List, Dict, Any, Optional
+
+import httpx
+import numpy as np
+
+from benchmarks import suite
+from benchmarks.stand_ins import FakeEmbedder
+
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+DEFAULT_MIX = "chat=1,search=3,graph=2"
+
+
+# -----------------------------
+# Request mix
+# -----------------------------
+class RequestMix:
+    """Weighted random requests over chat / search / graph endpoints."""
+
+    def __init__(self, nodes: List[Dict[str, Any]], weights: Dict[str, float], seed: int = 11):
+        self.rng = random.Random(seed)
+        self.queries = suite.query_mix(nodes, n=500, seed=seed)
+        self.ids = [node["id"] for node in nodes]
+        self.kinds = [k for k in ("chat", "search", "graph") if weights.get(k)]
+        self.weights = [weights[k] for k in self.kinds]
+
+    def next(self):
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        if kind == "chat":
+            return kind, "POST", "/api/chat", {"json": {"query": self.rng.choice(self.queries)}}
+        if kind == "search":
+            return kind, "POST", "/api/search", {"json": {"query": self.rng.choice(self.queries), "top_k": 5}}
+        ids = self.rng.sample(self.ids, self.rng.randint(5, 10))
+        return kind, "GET", "/api/graph/byIds", {"params": {"ids": ",".join(ids)}}
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    weights = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    unknown = set(weights) - {"chat", "search", "graph"}
+    if unknown:
+        raise ValueError(f"unknown endpoints in mix: {sorted(unknown)}")
+    return weights
+
+
+# -----------------------------
+# Measurement
+# -----------------------------
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Counter = Counter()
+        self.statuses: Counter = Counter()
+        self.dropped = 0
+
+    def add(self, kind: str, ms: float, status) -> None:
+        self.latencies.setdefault(kind, []).append(ms)
+        self.statuses[status] += 1
+        if not isinstance(status, int) or status >= 400:
+            self.errors[kind] += 1
+
+
+class LoopLagMonitor:
+    """Samples how late a periodic sleep wakes up on the loop it runs on.
+
+    Lag means something blocked the event loop (synchronous work in a
+    handler, or a saturated loop), delaying every request it serves.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            t = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, (loop.time() - t - self.interval) * 1000))
+
+    def take(self) -> List[float]:
+        samples, self.samples = self.samples, []
+        return samples
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+
+async def send(client: httpx.AsyncClient, request, rec: Recorder, started: float) -> None:
+    kind, method, url, kwargs = request
+    try:
+        resp = await client.request(method, url, **kwargs)
+        status = resp.status_code
+    except Exception as e:
+        status = type(e).__name__
+    rec.add(kind, (asyncio.get_running_loop().time() - started) * 1000, status)
+
+
+async def closed_loop(client, mix: RequestMix, rec: Recorder, users: int, duration: float, think: float = 0.0):
+    """`users` clients each send the next request as soon as the previous one returns."""
+    loop = asyncio.get_running_loop()
+    end = loop.time() + duration
+
+    async def user():
+        while loop.time() < end:
+            await send(client, mix.next(), rec, loop.time())
+            if think:
+                await asyncio.sleep(think)
+
+    await asyncio.gather(*(user() for _ in range(users)))
+
+
+async def open_loop(client, mix: RequestMix, rec: Recorder, rate: float, duration: float,
+                    poisson: bool = False, max_in_flight: int = 10000):
+    """Requests arrive at `rate`/s regardless of how fast they complete.
+
+    Latency is measured from the scheduled arrival time, so queueing delay
+    caused by a slow server is counted (no coordinated omission).
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    tasks = set()
+    scheduled = start
+    rng = random.Random(3)
+    while scheduled - start < duration:
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(tasks) >= max_in_flight:
+            rec.dropped += 1
+        else:
+            task = loop.create_task(send(client, mix.next(), rec, scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        scheduled += rng.expovariate(rate) if poisson else 1.0 / rate
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+# -----------------------------
+# Reporting
+# -----------------------------
+def latency_stats(samples: List[float]) -> Dict[str, Any]:
+    if not samples:
+        return {"count": 0}
+    arr = np.asarray(samples)
+    return {
+        "count": len(samples),
+        "p50_ms": round(float(np.percentile(arr, 50)), 2),
+        "p90_ms": round(float(np.percentile(arr, 90)), 2),
+        "p95_ms": round(float(np.percentile(arr, 95)), 2),
+        "p99_ms": round(float(np.percentile(arr, 99)), 2),
+        "max_ms": round(float(arr.max()), 2),
+    }
+
+
+def histogram(samples: List[float]) -> List[List[Any]]:
+    """[[upper bound ms, count], ...]; the last bound is "+Inf"."""
+    counts = np.histogram(samples, bins=[0, *HISTOGRAM_BOUNDS_MS, np.inf])[0]
+    return [[b, int(c)] for b, c in zip([*HISTOGRAM_BOUNDS_MS, "+Inf"], counts)]
+
+
+def summarize(label: str, rec: Recorder, elapsed: float, lag: List[float]) -> Dict[str, Any]:
+    all_samples = [ms for samples in rec.latencies.values() for ms in samples]
+    total = len(all_samples)
+    errors = sum(rec.errors.values())
+    return {
+        "step": label,
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "dropped": rec.dropped,
+        "throughput_per_s": round(total / elapsed, 2) if elapsed else 0.0,
+        "latency": latency_stats(all_samples),
+        "by_endpoint": {
+            kind: {**latency_stats(samples), "errors": rec.errors.get(kind, 0)}
+            for kind, samples in sorted(rec.latencies.items())
+        },
+        "statuses": {str(k): v for k, v in rec.statuses.items()},
+        "histogram": histogram(all_samples),
+        "loop_lag": latency_stats(lag),
+    }
+
+
+def print_step(result: Dict[str, Any]) -> None:
+    lat, lag = result["latency"], result["loop_lag"]
+    print(f"\n== {result['step']}: {result['requests']} requests, {result['throughput_per_s']} req/s, "
+          f"errors {result['error_rate']:.2%}" + (f", dropped {result['dropped']}" if result["dropped"] else ""))
+    if lat["count"]:
+        print(f"   latency ms  p50 {lat['p50_ms']}  p95 {lat['p95_ms']}  p99 {lat['p99_ms']}  max {lat['max_ms']}")
+    if lag["count"]:
+        print(f"   loop lag ms p50 {lag['p50_ms']}  p99 {lag['p99_ms']}  max {lag['max_ms']}")
+    for kind, s in result["by_endpoint"].items():
+        if s["count"]:
+            print(f"   {kind:<7} n={s['count']:<6} p50 {s['p50_ms']:<8} p99 {s['p99_ms']:<8} errors {s['errors']}")
+    peak = max((c for _, c in result["histogram"]), default=0) or 1
+    for bound, count in result["histogram"]:
+        if count:
+            label = f"<= {bound} ms" if bound != "+Inf" else "> 10000 ms"
+            print(f"   {label:>12} {count:>7} {'#' * max(1, round(40 * count / peak))}")
+
+
+def print_summary(results: List[Dict[str, Any]]) -> None:
+    print(f"\n{'step':<22}{'req/s':>9}{'err %':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'lag p99':>9}")
+    for r in results:
+        lat, lag = r["latency"], r["loop_lag"]
+        print(f"{r['step']:<22}{r['throughput_per_s']:>9}{r['error_rate'] * 100:>8.2f}"
+              f"{lat.get('p50_ms', '-'):>9}{lat.get('p95_ms', '-'):>9}{lat.get('p99_ms', '-'):>9}"
+              f"{lag.get('p99_ms', '-'):>9}")
+
+
+# -----------------------------
+# Targets
+# -----------------------------
+def stubbed_app(llm_latency_ms: float, backend_latency_ms: float, embed_latency_ms: float):
+    """api.main:app with its chat service replaced by one wired to the stand-ins."""
+    import api.main as api_main
+
+    nodes = suite.load_nodes()
+    # concurrent requests here, so embed micro-batching is on as in production
+    api_main.chat_service = suite.make_service(
+        nodes, FakeEmbedder(latency_ms=embed_latency_ms), llm_latency_ms, backend_latency_ms,
+        micro_batching=True
+    )
+    return api_main.app, nodes
+
+
+def serve_in_thread(app, port: int, monitor: LoopLagMonitor):
+    """Run the app under uvicorn on 127.0.0.1 in a background thread."""
+    import uvicorn
+
+    async def start_monitor():
+        monitor.start()
+    app.router.on_startup.append(start_monitor)
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="loadtest-server", daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"server failed to start on port {port}")
+        time.sleep(0.05)
+    return server, thread
+
+
+async def run_steps(args, mix: RequestMix, base_url: str, transport=None,
+                    monitor: Optional[LoopLagMonitor] = None) -> List[Dict[str, Any]]:
+    in_process = monitor is None
+    if in_process:
+        # in-process: the app shares this loop, so measure lag here
+        monitor = LoopLagMonitor()
+        monitor.start()
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    results = []
+    async with httpx.AsyncClient(base_url=base_url, transport=transport, timeout=args.timeout, limits=limits) as client:
+        steps = args.concurrency if args.mode == "closed" else args.rate
+        for value in steps:
+            rec = Recorder()
+            monitor.take()
+            start = time.perf_counter()
+            if args.mode == "closed":
+                label = f"closed users={value:g}"
+                await closed_loop(client, mix, rec, int(value), args.duration, think=args.think_ms / 1000)
+            else:
+                label = f"open rate={value:g}/s"
+                await open_loop(client, mix, rec, value, args.duration, poisson=args.poisson,
+                                max_in_flight=args.max_in_flight)
+            result = summarize(label, rec, time.perf_counter() - start, monitor.take())
+            print_step(result)
+            results.append(result)
+    if in_process:
+        monitor.stop()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", default="1,4,16", help="closed loop: comma-separated user counts, one step each")
+    parser.add_argument("--rate", default="5,20,50", help="open loop: comma-separated arrival rates (req/s), one step each")
+    parser.add_argument("--poisson", action="store_true", help="open loop: exponential inter-arrival times")
+    parser.add_argument("--max-in-flight", type=int, default=10000, help="open loop: drop arrivals beyond this")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per step")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="closed loop: pause between a user's requests")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"endpoint weights (default {DEFAULT_MIX})")
+    parser.add_argument("--transport", choices=["inprocess", "localhost"], default="inprocess")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", help="drive an already running server instead of the stubbed app")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--backend-latency-ms", type=float, default=5.0, help="per Pinecone/Neo4j request")
+    parser.add_argument("--embed-latency-ms", type=float, default=10.0, help="per embedder.encode call")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--out", help="write all step results to this JSON file")
+    args = parser.parse_args(argv)
+    args.concurrency = [float(v) for v in args.concurrency.split(",")]
+    args.rate = [float(v) for v in args.rate.split(",")]
+    weights = parse_mix(args.mix)
+
+    if args.url:
+        mix = RequestMix(suite.load_nodes(), weights)
+        # lag is measured on the generator's loop only; the server is remote
+        results = asyncio.run(run_steps(args, mix, args.url))
+    else:
+        app, nodes = stubbed_app(args.llm_latency_ms, args.backend_latency_ms, args.embed_latency_ms)
+        mix = RequestMix(nodes, weights)
+        if args.transport == "inprocess":
+            transport = httpx.ASGITransport(app=app)
+            results = asyncio.run(run_steps(args, mix, "http://loadtest", transport=transport))
+        else:
+            monitor = LoopLagMonitor()
+            server, thread = serve_in_thread(app, args.port, monitor)
+            try:
+                results = asyncio.run(run_steps(args, mix, f"http://127.0.0.1:{args.port}", monitor=monitor))
+            finally:
+                server.should_exit = True
+                thread.join(timeout=10)
+
+    print_summary(results)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"args": {k: v for k, v in vars(args).items()}, "steps": results}, f, indent=2)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
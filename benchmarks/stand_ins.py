@@ -0,0 +1,250 @@
+# benchmarks/stand_ins.py
+# Local stand-ins for the external services, shaped like the real clients so
+# the production code paths run unchanged: a Pinecone-style in-memory index,
+# a Neo4j-style driver answering the app's Cypher from a CSRGraph and a
+# deterministic embedder. The LLM stand-in is FakeProvider from
+# services/llm_providers.py.
+
+import re
+import threading
+import time
+import zlib
+from typing import List, Dict, Any
+
+import numpy as np
+
+from services.graph_engine import CSRGraph
+from services.vector_store import dataset_items
+
+
+def _sleep_ms(ms: float) -> None:
+    if ms > 0:
+        time.sleep(ms / 1000.0)
+
+
+# -----------------------------
+# Embeddings
+# -----------------------------
+class FakeEmbedder:
+    """Deterministic pseudo-embeddings (seeded by a CRC of the text)."""
+
+    def __init__(self, dim: int = 1024, latency_ms: float = 0.0, per_text_ms: float = 0.0):
+        self.dim = dim
+        self.latency_ms = latency_ms
+        self.per_text_ms = per_text_ms
+        self.calls = 0
+
+    def encode(self, texts, batch_size: int = 32, normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        texts = list(texts)
+        self.calls += 1
+        _sleep_ms(self.latency_ms + self.per_text_ms * len(texts))
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            out[i] = np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(self.dim)
+        if normalize_embeddings:
+            out /= np.linalg.norm(out, axis=1, keepdims=True)
+        return out
+
+
+# -----------------------------
+# Vector store
+# -----------------------------
+class FakePineconeIndex:
+    """In-memory index with the subset of the Pinecone Index API the app uses.
+
+    ``query`` supports ``$in`` metadata filters; ``latency_ms`` is added to
+    every request to stand in for the network round trip.
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._metadata: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._ids: List[str] = []
+        self.requests = 0
+
+    @classmethod
+    def from_dataset(cls, nodes: List[Dict[str, Any]], embedder, latency_ms: float = 0.0) -> "FakePineconeIndex":
+        index = cls(latency_ms=0.0)
+        items = dataset_items(nodes)
+        vectors = embedder.encode([text for _, text, _ in items], normalize_embeddings=True)
+        index.upsert([
+            {"id": _id, "values": vec, "metadata": meta}
+            for (_id, _, meta), vec in zip(items, vectors)
+        ])
+        index.latency_ms = latency_ms
+        index.requests = 0
+        return index
+
+    def upsert(self, vectors):
+        _sleep_ms(self.latency_ms)
+        with self._lock:
+            self.requests += 1
+            for v in vectors:
+                self._vectors[v["id"]] = np.asarray(v["values"], dtype=np.float32)
+                self._metadata[v["id"]] = v.get("metadata", {})
+            self._matrix = None
+        return {"upserted_count": len(vectors)}
+
+    def delete(self, ids):
+        _sleep_ms(self.latency_ms)
+        with self._lock:
+            self.requests += 1
+            for _id in ids:
+                self._vectors.pop(_id, None)
+                self._metadata.pop(_id, None)
+            self._matrix = None
+
+    def _matches_filter(self, meta: Dict[str, Any], flt: Dict[str, Any]) -> bool:
+        for field, cond in flt.items():
+            wanted = set(cond["$in"])
+            value = meta.get(field)
+            values = value if isinstance(value, list) else [value]
+            if not wanted.intersection(values):
+                return False
+        return True
+
+    def query(self, vector, top_k: int, include_metadata: bool = True, include_values: bool = False, filter=None):
+        _sleep_ms(self.latency_ms)
+        with self._lock:
+            self.requests += 1
+            if self._matrix is None:
+                self._ids = list(self._vectors)
+                self._matrix = np.stack([self._vectors[i] for i in self._ids]) if self._ids else None
+            ids, matrix = self._ids, self._matrix
+        if matrix is None:
+            return {"matches": []}
+        scores = matrix @ np.asarray(vector, dtype=np.float32)
+        order = np.argsort(-scores)
+        matches = []
+        for i in order:
+            meta = self._metadata[ids[i]]
+            if filter and not self._matches_filter(meta, filter):
+                continue
+            matches.append({"id": ids[i], "score": float(scores[i]), "metadata": meta if include_metadata else {}})
+            if len(matches) == top_k:
+                break
+        return {"matches": matches}
+
+    def __len__(self):
+        return len(self._vectors)
+
+
+# -----------------------------
+# Graph
+# -----------------------------
+class FakeResult(list):
+    def single(self):
+        return self[0] if self else None
+
+
+class FakeTransaction:
+    def __init__(self, driver: "FakeGraphDriver"):
+        self.driver = driver
+
+    def run(self, query: str, **params):
+        return self.driver._write(query, params)
+
+
+class FakeSession:
+    def __init__(self, driver: "FakeGraphDriver"):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query: str, **params):
+        return self.driver._read(query, params)
+
+    def execute_write(self, fn, *args, **kwargs):
+        _sleep_ms(self.driver.latency_ms)
+        self.driver.transactions += 1
+        return fn(FakeTransaction(self.driver), *args, **kwargs)
+
+    def close(self):
+        pass
+
+
+class FakeGraphDriver:
+    """Neo4j-driver look-alike answering the app's read queries from a CSRGraph.
+
+    Reads are recognised by their shape (graph context, subgraph, version);
+    writes from load_to_neo4j.py are counted per statement, not applied.
+    ``latency_ms`` is added to every read query and write transaction.
+    """
+
+    _DEPTH = re.compile(r"\[\*1\.\.(\d+)\]")
+    _WRITE_KINDS = (
+        ("DETACH DELETE", "delete_nodes"),
+        ("DELETE r", "delete_relationships"),
+        ("MERGE (a)", "create_relationships"),
+        ("MERGE (n", "upsert_nodes"),
+        ("CONSTRAINT", "constraints"),
+        ("GraphMeta", "version"),
+    )
+
+    def __init__(self, graph: CSRGraph, latency_ms: float = 0.0):
+        self.graph = graph
+        self.latency_ms = latency_ms
+        self.version = graph.version
+        self.queries = 0
+        self.transactions = 0
+        self.rows_written: Dict[str, int] = {}
+
+    @classmethod
+    def from_dataset(cls, nodes: List[Dict[str, Any]], version: str = "bench", latency_ms: float = 0.0) -> "FakeGraphDriver":
+        return cls(CSRGraph(nodes, version=version), latency_ms=latency_ms)
+
+    def session(self, **kwargs) -> FakeSession:
+        return FakeSession(self)
+
+    def verify_connectivity(self):
+        return None
+
+    def close(self):
+        pass
+
+    def _read(self, query: str, params: Dict[str, Any]) -> FakeResult:
+        _sleep_ms(self.latency_ms)
+        self.queries += 1
+        if "GraphMeta" in query:
+            return FakeResult([{"version": self.version}])
+        if "UNWIND $ids AS nid" in query:
+            match = self._DEPTH.search(query)
+            depth = int(match.group(1)) if match else 1
+            facts = self.graph.neighbour_facts(params["ids"], depth=depth, limit=params.get("limit", 10))
+            return FakeResult([
+                {
+                    "source": f["source"], "rel": f["rel"], "labels": f["labels"], "id": f["target_id"],
+                    "name": f["target_name"], "type": f["labels"][0], "description": f["target_desc"]
+                }
+                for f in facts
+            ])
+        if "$node_ids" in query:
+            return FakeResult(self._subgraph_records(params["node_ids"]))
+        raise NotImplementedError(f"FakeGraphDriver cannot answer: {query[:80]}")
+
+    def _subgraph_records(self, node_ids: List[str]) -> List[Dict[str, Any]]:
+        g = self.graph
+        members = {g.index[nid] for nid in node_ids if nid in g.index}
+        records = []
+        for i in sorted(members):
+            records.append({
+                "id": g.ids[i], "name": g.names[i], "type": g.types[i], "labels": g.labels(i),
+                "links": [{"to": g.ids[t], "label": g.rel_types[c]} for t, c in g.neighbours(i) if t in members]
+            })
+        return records
+
+    def _write(self, query: str, params: Dict[str, Any]) -> FakeResult:
+        kind = next((name for marker, name in self._WRITE_KINDS if marker in query), "other")
+        rows = params.get("rows") or params.get("ids") or []
+        self.rows_written[kind] = self.rows_written.get(kind, 0) + len(rows)
+        if "version" in params:
+            self.version = params["version"]
+        return FakeResult()
+
@@ -0,0 +1,256 @@
+# benchmarks/suite.py
+# Offline benchmark scenarios: the ChatService hot paths and both ingestion
+# scripts, run against the stand-ins in benchmarks/stand_ins.py (and
+# FakeProvider for the LLM).
+
+import contextlib
+import io
+import json
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Callable
+
+import numpy as np
+
+from services.chat_service import ChatService, EMBED_MODEL
+from services.embedding_cache import EmbeddingCache
+from services.neighbor_cache import NeighborCache
+from services.metrics import with_timings
+from services.llm_providers import FakeProvider
+from services.vector_store import PineconeVectorStore
+from benchmarks.stand_ins import FakeEmbedder, FakePineconeIndex, FakeGraphDriver
+
+DATA_FILE = "vietnam_travel_dataset.json"
+DEFAULT_THRESHOLD = 0.20   # relative slowdown that counts as a regression
+MIN_DELTA_MS = 0.05        # latency changes smaller than this are noise, whatever the ratio
+RUN_DEFAULTS = {"iterations": 200, "llm_latency_ms": 0.0, "backend_latency_ms": 0.0, "embed_latency_ms": 0.0}
+COMPARE_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+# -----------------------------
+# Measurement
+# -----------------------------
+def summarize(samples_ms: List[float], total_s: float = None, items: int = None) -> Dict[str, Any]:
+    """Latency percentiles; throughput only when the samples ran back to back over ``total_s``."""
+    arr = np.asarray(samples_ms, dtype=np.float64)
+    stats = {
+        "iterations": len(samples_ms),
+        "throughput_per_s": round(len(samples_ms) / total_s, 2) if total_s else None,
+        "mean_ms": round(float(arr.mean()), 3),
+        "p50_ms": round(float(np.percentile(arr, 50)), 3),
+        "p95_ms": round(float(np.percentile(arr, 95)), 3),
+        "p99_ms": round(float(np.percentile(arr, 99)), 3),
+    }
+    if items is not None:
+        stats["items_per_s"] = round(items * len(samples_ms) / total_s, 1) if total_s else None
+    return stats
+
+
+def measure(fn: Callable[[Any], Any], inputs: List[Any], iterations: int, warmup: int = 3,
+            items: int = None) -> Dict[str, Any]:
+    """Call fn over `inputs` (cycled) `iterations` times after `warmup` untimed calls."""
+    for i in range(min(warmup, iterations)):
+        fn(inputs[i % len(inputs)])
+    samples = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        t = time.perf_counter()
+        fn(inputs[i % len(inputs)])
+        samples.append((time.perf_counter() - t) * 1000)
+    return summarize(samples, time.perf_counter() - start, items)
+
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow the scripts' prints and progress bars."""
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        yield
+
+
+# -----------------------------
+# Fixtures
+# -----------------------------
+def load_nodes(path: str = DATA_FILE) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def query_mix(nodes: List[Dict[str, Any]], n: int = 200, seed: int = 7) -> List[str]:
+    """Realistic-looking questions built from dataset names, cities and tags."""
+    rng = np.random.default_rng(seed)
+    cities = sorted({node["name"] for node in nodes if node.get("type") == "City"})
+    tags = sorted({tag for node in nodes for tag in node.get("tags", [])})
+    names = [node["name"] for node in nodes if node.get("name")]
+    templates = [
+        lambda: f"What is {names[rng.integers(len(names))]} like?",
+        lambda: f"Best {tags[rng.integers(len(tags))]} spots in {cities[rng.integers(len(cities))]}",
+        lambda: f"Plan a 3-day trip to {cities[rng.integers(len(cities))]}",
+        lambda: f"{tags[rng.integers(len(tags))]} and {tags[rng.integers(len(tags))]} near {cities[rng.integers(len(cities))]}",
+    ]
+    return [templates[i % len(templates)]() for i in range(n)]
+
+
+def make_service(nodes, embedder, llm_latency_ms: float, backend_latency_ms: float, local_graph: bool = False,
+                 micro_batching: bool = False) -> ChatService:
+    """ChatService wired to stand-ins, with the query, answer and neighbour caches disabled.
+
+    Embed micro-batching is off by default: the suite calls one query at a
+    time, where batching cannot help and would only add queue hand-offs.
+    """
+    index = FakePineconeIndex.from_dataset(nodes, embedder, latency_ms=backend_latency_ms)
+    kwargs = {"graph": FakeGraphDriver.from_dataset(nodes).graph} if local_graph else \
+        {"driver": FakeGraphDriver.from_dataset(nodes, latency_ms=backend_latency_ms)}
+    svc = ChatService(
+        embedder=embedder,
+        vector_store=PineconeVectorStore(index),
+        llm=FakeProvider(latency_ms=llm_latency_ms),
+        **kwargs
+    )
+    svc.embed_cache = EmbeddingCache(EMBED_MODEL, max_entries=0)
+    svc.answer_cache = None
+    svc.neighbor_cache = None
+    svc.micro_batching = micro_batching
+    return svc
+
+
+# -----------------------------
+# Scenarios
+# -----------------------------
+def run_suite(iterations: int = 200, llm_latency_ms: float = 0.0, backend_latency_ms: float = 0.0,
+              embed_latency_ms: float = 0.0, ingest_iterations: int = 3, only: List[str] = None) -> Dict[str, Any]:
+    nodes = load_nodes()
+    queries = query_mix(nodes)
+    embedder = FakeEmbedder(latency_ms=embed_latency_ms)
+    svc = make_service(nodes, embedder, llm_latency_ms, backend_latency_ms)
+    local_svc = make_service(nodes, embedder, llm_latency_ms, backend_latency_ms, local_graph=True)
+
+    # node-id inputs drawn from real retrieval results so graph queries hit realistic neighbourhoods
+    id_sets = [[m["id"] for m in svc.pinecone_query(q)] for q in queries[:50]]
+
+    results: Dict[str, Any] = {}
+
+    def want(name):
+        return not only or any(name.startswith(o) for o in only)
+
+    if want("pinecone_query"):
+        results["pinecone_query"] = measure(svc.pinecone_query, queries, iterations)
+    if want("fetch_graph_context"):
+        results["fetch_graph_context.neo4j"] = measure(svc.fetch_graph_context, id_sets, iterations)
+        results["fetch_graph_context.local"] = measure(local_svc.fetch_graph_context, id_sets, iterations)
+        results["fetch_graph_context.neo4j_depth2"] = measure(
+            lambda ids: svc.fetch_graph_context(ids, neighborhood_depth=2), id_sets, iterations
+        )
+        # warm neighbour cache: repeated popular nodes are answered in-process
+        svc.neighbor_cache = NeighborCache()
+        results["fetch_graph_context.neo4j_cached"] = measure(svc.fetch_graph_context, id_sets, iterations)
+        svc.neighbor_cache = None
+    if want("get_graph_data"):
+        wide = [a + b for a, b in zip(id_sets, id_sets[1:])]
+        results["get_graph_data.neo4j"] = measure(svc.get_graph_data, wide, iterations)
+        results["get_graph_data.local"] = measure(local_svc.get_graph_data, wide, iterations)
+    if want("process_query"):
+        stage_samples: Dict[str, List[float]] = {}
+
+        def timed(q):
+            _, timings = with_timings(svc.process_query, q)
+            for name, ms in timings.items():
+                stage_samples.setdefault(name, []).append(ms)
+
+        results["process_query"] = measure(timed, queries, iterations, warmup=0)
+        # per-stage breakdown of the same calls (latency only)
+        for name, samples in sorted(stage_samples.items()):
+            if name != "total":
+                results[f"process_query.{name}"] = summarize(samples)
+    if want("pinecone_upload"):
+        results["pinecone_upload"] = bench_pinecone_upload(nodes, embedder, backend_latency_ms, ingest_iterations)
+    if want("load_to_neo4j"):
+        results["load_to_neo4j"] = bench_load_to_neo4j(nodes, backend_latency_ms, ingest_iterations)
+
+    svc.close()
+    local_svc.close()
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": iterations,
+            "llm_latency_ms": llm_latency_ms,
+            "backend_latency_ms": backend_latency_ms,
+            "embed_latency_ms": embed_latency_ms,
+        },
+        "results": results
+    }
+
+
+def bench_pinecone_upload(nodes, embedder, latency_ms: float, iterations: int) -> Dict[str, Any]:
+    """Full (manifest-less) upload of the dataset into a fresh in-memory index."""
+    import pinecone_upload
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def run(_):
+            with quiet():
+                pinecone_upload.upload(
+                    FakePineconeIndex(latency_ms=latency_ms), embedder, nodes,
+                    manifest_path=os.path.join(tmp, "pinecone.json"), full=True
+                )
+        return measure(run, [None], iterations, warmup=1, items=len(nodes))
+
+
+def bench_load_to_neo4j(nodes, latency_ms: float, iterations: int) -> Dict[str, Any]:
+    """Full load of the dataset through the bulk UNWIND writers into a counting driver."""
+    import load_to_neo4j
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def run(_):
+            driver = FakeGraphDriver.from_dataset(nodes, latency_ms=latency_ms)
+            with quiet():
+                load_to_neo4j.load(
+                    driver, nodes, "bench", manifest_path=os.path.join(tmp, "neo4j.json"), full=True
+                )
+        return measure(run, [None], iterations, warmup=1, items=len(nodes))
+
+
+# -----------------------------
+# Baselines
+# -----------------------------
+def save(report: Dict[str, Any], path: str) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD) -> List[Dict[str, Any]]:
+    """One row per (scenario, metric); ``regression`` is set when current is
+    slower than baseline by more than ``threshold`` (latency up, throughput
+    down). Latency changes under MIN_DELTA_MS are never flagged."""
+    rows = []
+    for name, base in baseline["results"].items():
+        cur = current["results"].get(name)
+        if cur is None:
+            continue
+        for metric in COMPARE_METRICS + ("throughput_per_s",):
+            b, c = base.get(metric), cur.get(metric)
+            if not b or c is None:
+                continue
+            change = (c - b) / b
+            if metric == "throughput_per_s":
+                regression = -change > threshold
+            else:
+                regression = change > threshold and c - b >= MIN_DELTA_MS
+            rows.append({
+                "scenario": name,
+                "metric": metric,
+                "baseline": b,
+                "current": c,
+                "change_pct": round(change * 100, 1),
+                "regression": regression
+            })
+    return rows
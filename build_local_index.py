@@ -0,0 +1,32 @@
+# build_local_index.py
+# Build the local memory-mapped vector index used when VECTOR_BACKEND = "local".
+import json
+import time
+import config
+from services.vector_store import LocalVectorStore
+from services.embedders import load_embedder
+
+# -----------------------------
+# Config
+# -----------------------------
+DATA_FILE = "vietnam_travel_dataset.json"
+BATCH_SIZE = 32
+EMBED_MODEL = "BAAI/bge-m3"
+LOCAL_INDEX_PATH = getattr(config, "LOCAL_INDEX_PATH", "data/local_index")
+
+# -----------------------------
+# Main build
+# -----------------------------
+def main():
+    with open(DATA_FILE, "r", encoding="utf-8") as f:
+        nodes = json.load(f)
+
+    embedder = load_embedder(model=EMBED_MODEL)
+    print(f"Embedding {len(nodes)} nodes into {LOCAL_INDEX_PATH} ...")
+    start = time.perf_counter()
+    store = LocalVectorStore.build(LOCAL_INDEX_PATH, embedder, nodes, batch_size=BATCH_SIZE)
+    print(f"Wrote {len(store)} vectors ({store.matrix.shape[1]} dims) in {time.perf_counter() - start:.1f}s.")
+
+# -----------------------------
+if __name__ == "__main__":
+    main()
@@ -24,3 +24,114 @@ PINECONE_CLOUD = "aws"
 PINECONE_ENV = "us-east-1"
 PINECONE_INDEX_NAME = "vietnam-travel"
 PINECONE_VECTOR_DIM = 1024       # BGE-M3 default dense embedding dimension
+
+# Vector store backend: "pinecone" (managed index) or "local" (memory-mapped
+# index built by build_local_index.py, no network round trip, works offline)
+VECTOR_BACKEND = "pinecone"
+LOCAL_INDEX_PATH = "data/local_index"
+
+# Query embedding cache: in-process LRU size, plus an optional SQLite file
+# (e.g. "data/embedding_cache.sqlite") so cached vectors survive restarts
+EMBED_CACHE_SIZE = 1024
+EMBED_CACHE_PATH = None
+
+# Upper bound for fetch_graph_context(neighborhood_depth=...) hops
+MAX_NEIGHBORHOOD_DEPTH = 3
+
+# Seconds between re-reads of the graph load version (used for ETags)
+GRAPH_VERSION_TTL = 30
+
+# Size of the thread pool that runs the blocking embed/search/graph/LLM
+# pipeline for API requests (bounds concurrent in-flight queries). Requests
+# coalesced onto an identical in-flight query hold a thread while they wait
+API_WORKER_THREADS = 16
+# Separate pool for the retrieval half of /api/chat/stream (tokens are read
+# from the provider's async stream and hold no thread)
+STREAM_WORKER_THREADS = 16
+
+# Semantic answer cache: reuse answers for paraphrased questions whose query
+# embeddings are at least ANSWER_CACHE_THRESHOLD cosine-similar and whose
+# retrieved match ids overlap by ANSWER_CACHE_MIN_OVERLAP (Jaccard).
+# Entries are dropped after ANSWER_CACHE_TTL seconds or when the graph is reloaded.
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_THRESHOLD = 0.92
+ANSWER_CACHE_MIN_OVERLAP = 0.6
+ANSWER_CACHE_TTL = 3600
+ANSWER_CACHE_SIZE = 512
+
+# Rows per batched UNWIND transaction in load_to_neo4j.py
+NEO4J_BATCH_SIZE = 500
+
+# Graph backend: "neo4j", or "local" to serve graph facts from an in-process
+# graph built from vietnam_travel_dataset.json (read-only deployments)
+GRAPH_BACKEND = "neo4j"
+
+# Load the embedding model and connect to backends in the background at API
+# startup (one dummy encode + query); /api/ready reports 503 until done.
+# Failed steps are retried with exponential backoff (seconds). With warmup
+# off, components turn ready as requests first build them.
+WARMUP_ON_STARTUP = True
+WARMUP_RETRY_BASE = 1.0
+WARMUP_RETRY_MAX = 60.0
+
+# Shared embedding server: run `python -m services.embedding_server <socket>`
+# once per host and point API workers at its Unix socket so BGE-M3 is loaded
+# once instead of per worker. None = load the model in-process.
+EMBED_SERVER_SOCKET = None
+
+# Micro-batching of query encodes: a lone request is encoded immediately;
+# requests arriving while the model is busy form the next batch (lingering up
+# to EMBED_BATCH_MAX_WAIT_MS to fill it, at most EMBED_BATCH_MAX_SIZE texts)
+EMBED_MICRO_BATCHING = True
+EMBED_BATCH_MAX_SIZE = 32
+EMBED_BATCH_MAX_WAIT_MS = 5
+
+# Embedding backend: "torch" (SentenceTransformer) or "onnx" (ONNX Runtime;
+# run `python -m services.embedders export` first, then `parity` / `bench`)
+EMBED_BACKEND = "torch"
+ONNX_MODEL_DIR = "data/onnx/bge-m3"
+ONNX_QUANTIZE = True             # load the int8 dynamic-quantised export
+ONNX_THREADS = 0                 # intra-op threads; 0 = ONNX Runtime default
+ONNX_PARITY_THRESHOLD = 0.99     # min cosine vs PyTorch vectors for `parity`
+
+# Token budget for the retrieved context in the LLM prompt (matches + graph
+# facts, de-duplicated and packed by relevance)
+CONTEXT_TOKEN_BUDGET = 1200
+
+# Default retrieval for chat and /api/search: "dense" (vectors), "lexical"
+# (in-process BM25 over name/tags/text) or "hybrid" (reciprocal rank fusion)
+RETRIEVAL_MODE = "dense"
+
+# Batch endpoints (/api/search/batch, /api/chat/batch): max queries per
+# request and how many LLM calls one chat batch runs concurrently
+BATCH_MAX_QUERIES = 100
+BATCH_LLM_CONCURRENCY = 4
+
+# Per-stage latency histograms, error counters and prompt/response size
+# gauges, served in Prometheus text format at /metrics
+METRICS_ENABLED = True
+
+# Chat LLM provider clients (services/llm_providers.py) are built once and
+# reused. CHAT_PROVIDER may also be "fake" (canned answers, no network);
+# CHAT_MODEL overrides the provider's default model. Timeouts are seconds;
+# the read timeout applies per streamed chunk.
+# CHAT_MODEL = "gpt-4o-mini"
+LLM_CONNECT_TIMEOUT = 5.0
+LLM_READ_TIMEOUT = 60.0
+LLM_MAX_RETRIES = 2
+LLM_MAX_CONNECTIONS = 32         # pooled keep-alive connections per client
+LLM_KEEPALIVE_EXPIRY = 60.0      # seconds an idle connection stays in the pool
+
+# Concurrent /api/chat requests with the same normalised query and filters
+# share one in-flight pipeline run (counters under "single_flight" in /api/stats)
+SINGLE_FLIGHT_ENABLED = True
+
+# Per-node cache of Neo4j neighbour facts, keyed by node id + depth and
+# dropped whenever the graph version stamp written by load_to_neo4j.py
+# changes (picked up within GRAPH_VERSION_TTL). LRU-bounded to
+# NEIGHBOR_CACHE_SIZE node entries.
+NEIGHBOR_CACHE_ENABLED = True
+NEIGHBOR_CACHE_SIZE = 4096
+
+# Largest top_k accepted by /api/search and /api/search/batch
+SEARCH_MAX_TOP_K = 100
@@ -1,5 +1,5 @@
 import axios from 'axios'
-import { ChatResponse, SearchResponse, GraphResponse } from '../types'
+import { ChatResponse, SearchResponse, GraphResponse, ChatMatch, GraphFact } from '../types'
 
 const API_BASE_URL = 'http://localhost:8000'
 
@@ -8,12 +8,54 @@ const api = axios.create({
   timeout: 30000,
 })
 
+export interface ChatStreamHandlers {
+  onContext?: (context: { matches: ChatMatch[]; graph_facts: GraphFact[] }) => void
+  onToken?: (text: string) => void
+}
+
 export const chatApi = {
   chat: async (query: string): Promise<ChatResponse> => {
     const response = await api.post('/api/chat', { query })
     return response.data
   },
 
+  // Server-Sent Events over POST: context first, then answer tokens as they arrive
+  chatStream: async (query: string, handlers: ChatStreamHandlers = {}): Promise<string> => {
+    const response = await fetch(`${API_BASE_URL}/api/chat/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ query }),
+    })
+    if (!response.ok || !response.body) {
+      throw new Error(`Chat stream failed: ${response.status}`)
+    }
+
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+    let answer = ''
+    for (;;) {
+      const { done, value } = await reader.read()
+      if (done) break
+      buffer += decoder.decode(value, { stream: true })
+      let boundary = buffer.indexOf('\n\n')
+      while (boundary !== -1) {
+        const block = buffer.slice(0, boundary)
+        buffer = buffer.slice(boundary + 2)
+        boundary = buffer.indexOf('\n\n')
+
+        const event = block.match(/^event: (.*)$/m)?.[1]
+        const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] ?? '{}')
+        if (event === 'context') handlers.onContext?.(data)
+        else if (event === 'token') {
+          answer += data.text
+          handlers.onToken?.(data.text)
+        } else if (event === 'error') throw new Error(data.detail)
+      }
+    }
+    return answer
+  },
+
   search: async (query: string, topK?: number): Promise<SearchResponse> => {
     const response = await api.post('/api/search', { query, top_k: topK })
     return response.data
@@ -1,44 +1,26 @@
 # hybrid_chat.py
 import json
 from typing import List
-from openai import OpenAI
-from sentence_transformers import SentenceTransformer
 from pinecone import Pinecone, ServerlessSpec
 from neo4j import GraphDatabase
 import config
-try:
-    import google.generativeai as genai
-except Exception:
-    genai = None
+from services.embedders import load_embedder
+from services.llm_providers import load_provider
 
 # -----------------------------
 # Config
 # -----------------------------
 EMBED_MODEL = "BAAI/bge-m3"
-# Choose chat model based on provider
-CHAT_PROVIDER = getattr(config, "CHAT_PROVIDER", "openai").lower()
-CHAT_MODEL = (
-    "gpt-4o-mini" if CHAT_PROVIDER == "openai" else "gemini-2.5-flash"
-)
 TOP_K = 5
 INDEX_NAME = config.PINECONE_INDEX_NAME
 
 # -----------------------------
 # Initialize clients
 # -----------------------------
-client = None
-embedder = SentenceTransformer(EMBED_MODEL)
-
-# Configure Google Gemini client (preferred)
-if CHAT_PROVIDER == "google":
-    if not genai:
-        raise ImportError("google-generativeai is not installed. Please install it from requirements.txt")
-    if not getattr(config, "GOOGLE_API_KEY", None):
-        raise ValueError("GOOGLE_API_KEY is not set in config.py but CHAT_PROVIDER is 'google'.")
-    genai.configure(api_key=config.GOOGLE_API_KEY)
-else:
-    # Fallback to OpenAI if explicitly requested
-    client = OpenAI(api_key=config.OPENAI_API_KEY)
+embedder = load_embedder(model=EMBED_MODEL)
+
+# Chat provider from CHAT_PROVIDER (openai, google or fake)
+llm = load_provider()
 
 pc = Pinecone(api_key=config.PINECONE_API_KEY)
 
@@ -138,27 +120,8 @@ def build_prompt(user_query, pinecone_matches, graph_facts):
     return prompt
 
 def call_chat(prompt_messages):
-    """Call the selected chat provider (Google Gemini only)."""
-    # Google Gemini path (preferred)
-    if CHAT_PROVIDER == "google":
-        model = genai.GenerativeModel(CHAT_MODEL)
-        # Convert messages into a single text prompt; keep roles for clarity
-        joined = []
-        for m in prompt_messages:
-            role = m.get("role", "user")
-            content = m.get("content", "")
-            joined.append(f"{role.upper()}: {content}")
-        prompt_text = "\n\n".join(joined)
-        resp = model.generate_content(prompt_text)
-        return getattr(resp, "text", "") or getattr(resp, "candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "")
-    # Optional OpenAI fallback if provider not set to google
-    resp = client.chat.completions.create(
-        model=CHAT_MODEL,
-        messages=prompt_messages,
-        max_tokens=600,
-        temperature=0.2
-    )
-    return resp.choices[0].message.content
+    """Call the configured chat provider."""
+    return llm.complete(prompt_messages)
 
 # -----------------------------
 # Interactive chat
@@ -1,61 +1,156 @@
 # load_to_neo4j.py
 import json
+import sys
+from collections import defaultdict
+from functools import partial
 from neo4j import GraphDatabase
 from tqdm import tqdm
 import config
+from services.graph_meta import WRITE_VERSION_QUERY, dataset_version
+from services.manifest import (
+    MANIFEST_DIR, content_hash, node_connections, diff_hashes, diff_connections,
+    load_manifest, save_manifest
+)
 
 DATA_FILE = "vietnam_travel_dataset.json"
-
-driver = GraphDatabase.driver(config.NEO4J_URI, auth=(config.NEO4J_USER, config.NEO4J_PASSWORD))
+MANIFEST_FILE = f"{MANIFEST_DIR}/neo4j.json"
+BATCH_SIZE = getattr(config, "NEO4J_BATCH_SIZE", 500)  # rows per UNWIND transaction
 
 def create_constraints(tx):
     # generic uniqueness constraint on id for node label Entity (we also add label specific types)
     tx.run("CREATE CONSTRAINT IF NOT EXISTS FOR (n:Entity) REQUIRE n.id IS UNIQUE")
 
-def upsert_node(tx, node):
-    # use label from node['type'] and always add :Entity label
-    labels = [node.get("type","Unknown"), "Entity"]
-    label_cypher = ":" + ":".join(labels)
-    # keep a subset of properties to store (avoid storing huge nested objects)
-    props = {k:v for k,v in node.items() if k not in ("connections",)}
-    # set properties using parameters
+def upsert_nodes(tx, label, rows, type_labels=()):
+    # rows share one type label (labels can't be parameterised). Merge on
+    # :Entity alone so a node whose type changed is updated in place, and drop
+    # any other type label it still carries
+    stale = "".join(f":{other}" for other in sorted(set(type_labels) - {label}))
     tx.run(
-        f"MERGE (n{label_cypher} {{id: $id}}) "
-        "SET n += $props",
-        id=node["id"], props=props
+        "UNWIND $rows AS row "
+        "MERGE (n:Entity {id: row.id}) "
+        f"SET n += row.props, n:{label}"
+        + (f" REMOVE n{stale}" if stale else ""),
+        rows=rows
     )
 
-def create_relationship(tx, source_id, rel):
-    # rel is like {"relation": "Located_In", "target": "city_hanoi"}
-    rel_type = rel.get("relation", "RELATED_TO")
-    target_id = rel.get("target")
-    if not target_id:
-        return
-    # Create relationship if both nodes exist
-    cypher = (
-        "MATCH (a:Entity {id: $source_id}), (b:Entity {id: $target_id}) "
-        f"MERGE (a)-[r:{rel_type}]->(b) "
-        "RETURN r"
+def create_relationships(tx, rel_type, rows):
+    # rows are {"source": ..., "target": ...}; created only if both nodes exist
+    tx.run(
+        "UNWIND $rows AS row "
+        "MATCH (a:Entity {id: row.source}), (b:Entity {id: row.target}) "
+        f"MERGE (a)-[r:{rel_type}]->(b)",
+        rows=rows
     )
-    tx.run(cypher, source_id=source_id, target_id=target_id)
 
-def main():
-    with open(DATA_FILE, "r", encoding="utf-8") as f:
-        nodes = json.load(f)
+def delete_relationships(tx, rel_type, rows):
+    tx.run(
+        "UNWIND $rows AS row "
+        f"MATCH (a:Entity {{id: row.source}})-[r:{rel_type}]->(b:Entity {{id: row.target}}) "
+        "DELETE r",
+        rows=rows
+    )
+
+def delete_nodes(tx, ids):
+    tx.run("UNWIND $ids AS id MATCH (n:Entity {id: id}) DETACH DELETE n", ids=ids)
+
+def chunked(iterable, n):
+    for i in range(0, len(iterable), n):
+        yield iterable[i:i+n]
+
+def group_rels(triples):
+    """Group (source, rel_type, target) triples into {rel_type: [{"source", "target"}]}."""
+    groups = defaultdict(list)
+    for source_id, rel_type, target_id in triples:
+        groups[rel_type].append({"source": source_id, "target": target_id})
+    return groups
+
+def write_grouped(session, fn, groups, desc):
+    """Run fn(tx, key, batch) for every BATCH_SIZE slice of every group, one transaction each."""
+    with tqdm(total=sum(len(rows) for rows in groups.values()), desc=desc) as bar:
+        for key, rows in groups.items():
+            for batch in chunked(rows, BATCH_SIZE):
+                session.execute_write(fn, key, batch)
+                bar.update(len(batch))
 
-    with driver.session(database=config.NEO4J_DATABASE) as session:
+def write_version(tx, version):
+    # stamp the load so API caches keyed on the graph version are invalidated
+    tx.run(WRITE_VERSION_QUERY, version=version)
+
+def load(driver, nodes, version, manifest_path=MANIFEST_FILE, full=False, database=None):
+    """Apply node and relationship deltas since the last load, then stamp `version`.
+
+    `full` rewrites every node and relationship; removals are still diffed
+    against the previous manifest.
+    """
+    previous = load_manifest(manifest_path)
+    by_id = {node["id"]: node for node in nodes}
+    node_hashes = {
+        nid: content_hash({k: v for k, v in node.items() if k != "connections"})
+        for nid, node in by_id.items()
+    }
+    # only record relations whose target exists, so a target that is added
+    # later gets its incoming relations created then
+    connections = {
+        nid: [[rel, tgt] for rel, tgt in node_connections(node) if tgt in by_id]
+        for nid, node in by_id.items()
+    }
+
+    # every type label this loader has written, so a node whose type changed
+    # loses its old label even if no node has that type any more
+    labels = sorted({node.get("type", "Unknown") for node in nodes})
+    type_labels = set(labels) | set(previous.get("labels", []))
+
+    prev_hashes = previous.get("nodes", {})
+    if full:
+        # rewrite every node, but keep the old ids so removed nodes are still deleted
+        prev_hashes = dict.fromkeys(prev_hashes, "")
+    changed, removed = diff_hashes(node_hashes, prev_hashes)
+    removed_set = set(removed)
+    # DETACH DELETE drops every relation touching a removed node
+    prev_connections = {
+        src: [[rel, tgt] for rel, tgt in pairs if tgt not in removed_set]
+        for src, pairs in previous.get("connections", {}).items()
+        if src not in removed_set
+    }
+    rels_added, rels_removed = diff_connections(connections, prev_connections)
+    if full:
+        rels_added, _ = diff_connections(connections, {})
+    print(f"Nodes: {len(changed)} new/changed, {len(removed)} removed, "
+          f"{len(node_hashes) - len(changed)} unchanged. "
+          f"Relationships: +{len(rels_added)} / -{len(rels_removed)}.")
+
+    with driver.session(database=database) as session:
         session.execute_write(create_constraints)
-        # Upsert all nodes
-        for node in tqdm(nodes, desc="Creating nodes"):
-            session.execute_write(upsert_node, node)
+        with tqdm(total=len(removed), desc="Deleting nodes") as bar:
+            for batch in chunked(removed, BATCH_SIZE):
+                session.execute_write(delete_nodes, batch)
+                bar.update(len(batch))
+
+        # Upsert new and changed nodes, grouped by type label
+        node_groups = defaultdict(list)
+        for nid in changed:
+            node = by_id[nid]
+            props = {k: v for k, v in node.items() if k != "connections"}
+            node_groups[node.get("type", "Unknown")].append({"id": nid, "props": props})
+        write_grouped(session, partial(upsert_nodes, type_labels=type_labels), node_groups, "Creating nodes")
 
-        # Create relationships
-        for node in tqdm(nodes, desc="Creating relationships"):
-            conns = node.get("connections", [])
-            for rel in conns:
-                session.execute_write(create_relationship, node["id"], rel)
+        # Apply relationship deltas, grouped by relation type
+        write_grouped(session, delete_relationships, group_rels(rels_removed), "Deleting relationships")
+        write_grouped(session, create_relationships, group_rels(rels_added), "Creating relationships")
 
+        session.execute_write(write_version, version)
+
+    save_manifest(manifest_path, {"nodes": node_hashes, "connections": connections, "labels": labels})
     print("Done loading into Neo4j.")
 
+def main():
+    with open(DATA_FILE, "r", encoding="utf-8") as f:
+        nodes = json.load(f)
+    driver = GraphDatabase.driver(config.NEO4J_URI, auth=(config.NEO4J_USER, config.NEO4J_PASSWORD))
+    try:
+        load(driver, nodes, dataset_version(DATA_FILE), full="--full" in sys.argv, database=config.NEO4J_DATABASE)
+    finally:
+        driver.close()
+
 if __name__ == "__main__":
     main()
@@ -1,16 +1,30 @@
 # pinecone_upload.py
 import json
+import random
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
-from sentence_transformers import SentenceTransformer
 from pinecone import Pinecone, ServerlessSpec
 import config
+from services.vector_store import dataset_items
+from services.embedders import load_embedder
+from services.manifest import MANIFEST_DIR, content_hash, diff_hashes, load_manifest, save_manifest
 
 # -----------------------------
 # Config
 # -----------------------------
 DATA_FILE = "vietnam_travel_dataset.json"
 BATCH_SIZE = 32
+UPSERT_WORKERS = 4          # concurrent upsert requests
+MAX_IN_FLIGHT = 8           # encoded batches waiting for/under upsert (bounds memory)
+MAX_RETRIES = 6
+BASE_BACKOFF = 0.5          # seconds; doubled per retry, with full jitter
+MAX_BACKOFF = 30.0
+DELETE_BATCH_SIZE = 1000
+EMBED_MODEL = 'BAAI/bge-m3'
+MANIFEST_FILE = f"{MANIFEST_DIR}/pinecone.json"
 
 INDEX_NAME = config.PINECONE_INDEX_NAME
 VECTOR_DIM = config.PINECONE_VECTOR_DIM  # 1024 for BGE-M3
@@ -18,34 +32,29 @@ VECTOR_DIM = config.PINECONE_VECTOR_DIM  # 1024 for BGE-M3
 # -----------------------------
 # Initialize clients
 # -----------------------------
-embedder = SentenceTransformer('BAAI/bge-m3')
-pc = Pinecone(api_key=config.PINECONE_API_KEY)
-
-# -----------------------------
-# Create managed index if it doesn't exist
-# -----------------------------
-existing_indexes = pc.list_indexes().names()
-if INDEX_NAME not in existing_indexes:
-    print(f"Creating managed index: {INDEX_NAME}")
-    pc.create_index(
-        name=INDEX_NAME,
-        dimension=VECTOR_DIM,
-        metric="cosine",
-        spec=ServerlessSpec(
-            cloud=config.PINECONE_CLOUD,
-            region=config.PINECONE_ENV
+def connect_index():
+    """Create the managed index if it doesn't exist and return a handle to it."""
+    pc = Pinecone(api_key=config.PINECONE_API_KEY)
+    existing_indexes = pc.list_indexes().names()
+    if INDEX_NAME not in existing_indexes:
+        print(f"Creating managed index: {INDEX_NAME}")
+        pc.create_index(
+            name=INDEX_NAME,
+            dimension=VECTOR_DIM,
+            metric="cosine",
+            spec=ServerlessSpec(
+                cloud=config.PINECONE_CLOUD,
+                region=config.PINECONE_ENV
+            )
         )
-    )
-else:
-    print(f"Index {INDEX_NAME} already exists.")
-
-# Connect to the index
-index = pc.Index(INDEX_NAME)
+    else:
+        print(f"Index {INDEX_NAME} already exists.")
+    return pc.Index(INDEX_NAME)
 
 # -----------------------------
 # Helper functions
 # -----------------------------
-def get_embeddings(texts):
+def get_embeddings(embedder, texts):
     """Generate embeddings using BAAI/bge-m3 via sentence-transformers."""
     return embedder.encode(texts, normalize_embeddings=True).tolist()
 
@@ -53,45 +62,146 @@ def chunked(iterable, n):
     for i in range(0, len(iterable), n):
         yield iterable[i:i+n]
 
+def is_rate_limited(exc):
+    status = getattr(exc, "status", None) or getattr(exc, "status_code", None)
+    return status == 429 or "429" in str(exc) or "rate limit" in str(exc).lower()
+
+class AdaptiveThrottle:
+    """Shared pause between upserts: grows on rate-limit errors, decays on success."""
+
+    def __init__(self):
+        self.delay = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if self.delay:
+            time.sleep(self.delay)
+
+    def rate_limited(self):
+        with self._lock:
+            self.delay = min(MAX_BACKOFF, max(BASE_BACKOFF, self.delay * 2))
+
+    def succeeded(self):
+        with self._lock:
+            self.delay = self.delay / 2 if self.delay > 0.05 else 0.0
+
+class Manifest:
+    """Content hashes of vectors already in the index.
+
+    Updated after every successful batch, so it also serves as resume state
+    for an interrupted run.
+    """
+
+    def __init__(self, path, full=False):
+        self.path = path
+        self._lock = threading.Lock()
+        data = load_manifest(path)
+        hashes = data.get("vectors", {})
+        # --full or a different embedding model: every stored vector is
+        # re-upserted, but its id is kept so removed nodes are still deleted
+        if full or data.get("model") != EMBED_MODEL:
+            hashes = dict.fromkeys(hashes, "")
+        self.hashes = hashes
+
+    def mark(self, hashes):
+        with self._lock:
+            self.hashes.update(hashes)
+            self._save()
+
+    def forget(self, ids):
+        with self._lock:
+            for _id in ids:
+                self.hashes.pop(_id, None)
+            self._save()
+
+    def _save(self):
+        save_manifest(self.path, {"model": EMBED_MODEL, "vectors": self.hashes})
+
+def upsert_with_retry(index, vectors, throttle):
+    for attempt in range(MAX_RETRIES + 1):
+        throttle.wait()
+        try:
+            index.upsert(vectors)
+            throttle.succeeded()
+            return
+        except Exception as e:
+            if attempt == MAX_RETRIES:
+                raise
+            if is_rate_limited(e):
+                throttle.rate_limited()
+            time.sleep(random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt)))
+
 # -----------------------------
 # Main upload
 # -----------------------------
+def upload(index, embedder, nodes, manifest_path=MANIFEST_FILE, full=False):
+    """Embed and upsert new or changed nodes, deleting vectors for removed ones."""
+    items = dataset_items(nodes)
+    manifest = Manifest(manifest_path, full=full)
+
+    hashes = {_id: content_hash([text, meta]) for _id, text, meta in items}
+    changed, removed = diff_hashes(hashes, manifest.hashes)
+    changed = set(changed)
+    items = [item for item in items if item[0] in changed]
+
+    if removed:
+        print(f"Deleting {len(removed)} vectors no longer in the dataset...")
+        for ids in chunked(removed, DELETE_BATCH_SIZE):
+            index.delete(ids=ids)
+            manifest.forget(ids)
+
+    print(f"Preparing to upsert {len(items)} new or changed items to Pinecone "
+          f"({len(hashes) - len(items)} unchanged)...")
+
+    # The main thread encodes (producer) while a bounded pool upserts;
+    # the semaphore stops encoding from running too far ahead of the network.
+    throttle = AdaptiveThrottle()
+    in_flight = threading.BoundedSemaphore(MAX_IN_FLIGHT)
+    batches = list(chunked(items, BATCH_SIZE))
+    bar = tqdm(total=len(batches), desc="Uploading batches")
+    errors = []
+
+    def upsert_batch(ids, vectors):
+        try:
+            upsert_with_retry(index, vectors, throttle)
+            manifest.mark({_id: hashes[_id] for _id in ids})
+        except Exception as e:
+            errors.append(e)
+        finally:
+            in_flight.release()
+            bar.update(1)
+
+    with ThreadPoolExecutor(max_workers=UPSERT_WORKERS) as pool:
+        for batch in batches:
+            if errors:
+                break
+            ids = [item[0] for item in batch]
+            texts = [item[1] for item in batch]
+            metas = [item[2] for item in batch]
+
+            embeddings = get_embeddings(embedder, texts)
+
+            vectors = [
+                {"id": _id, "values": emb, "metadata": meta}
+                for _id, emb, meta in zip(ids, embeddings, metas)
+            ]
+
+            in_flight.acquire()
+            pool.submit(upsert_batch, ids, vectors)
+    bar.close()
+
+    if errors:
+        raise RuntimeError(
+            f"Upload stopped after {len(errors)} failed batch(es); rerun to resume from {manifest_path}"
+        ) from errors[0]
+
+    print("All items uploaded successfully.")
+
 def main():
     with open(DATA_FILE, "r", encoding="utf-8") as f:
         nodes = json.load(f)
-
-    items = []
-    for node in nodes:
-        semantic_text = node.get("semantic_text") or (node.get("description") or "")[:1000]
-        if not semantic_text.strip():
-            continue
-        meta = {
-            "id": node.get("id"),
-            "type": node.get("type"),
-            "name": node.get("name"),
-            "city": node.get("city", node.get("region", "")),
-            "tags": node.get("tags", [])
-        }
-        items.append((node["id"], semantic_text, meta))
-
-    print(f"Preparing to upsert {len(items)} items to Pinecone...")
-
-    for batch in tqdm(list(chunked(items, BATCH_SIZE)), desc="Uploading batches"):
-        ids = [item[0] for item in batch]
-        texts = [item[1] for item in batch]
-        metas = [item[2] for item in batch]
-
-        embeddings = get_embeddings(texts)
-
-        vectors = [
-            {"id": _id, "values": emb, "metadata": meta}
-            for _id, emb, meta in zip(ids, embeddings, metas)
-        ]
-
-        index.upsert(vectors)
-        time.sleep(0.2)
-
-    print("All items uploaded successfully.")
+    embedder = load_embedder(model=EMBED_MODEL)
+    upload(connect_index(), embedder, nodes, full="--full" in sys.argv)
 
 # -----------------------------
 if __name__ == "__main__":
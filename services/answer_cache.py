@@ -0,0 +1,117 @@
+# services/answer_cache.py
+# Semantic answer cache: reuse a generated answer for near-duplicate
+# questions (high embedding similarity and overlapping retrieval results).
+
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from services.filters import filters_key
+
+
+class SemanticAnswerCache:
+    """Bounded, TTL'd cache of answers keyed by query embedding.
+
+    A lookup hits when the cosine similarity to a stored query is at least
+    ``threshold`` and the Jaccard overlap of the retrieved match ids is at
+    least ``min_overlap``, and the stored query used the same metadata
+    filters (compared canonically, exact match). Entries are evicted least-recently-used once
+    ``max_entries`` is reached, and everything is dropped when the data
+    version changes (i.e. the dataset was reloaded).
+    """
+
+    def __init__(self, threshold: float = 0.92, ttl: float = 3600, max_entries: int = 512,
+                 min_overlap: float = 0.6):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.min_overlap = min_overlap
+        self.version = None
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._next_key = 0
+        self._matrix = None  # stacked vectors of current entries, rebuilt lazily
+        self._keys: List[int] = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, vec: List[float], match_ids: List[str], version: str,
+               filters=None) -> Optional[Dict[str, Any]]:
+        q = np.asarray(vec, dtype=np.float32)
+        ids = frozenset(match_ids)
+        scope = filters_key(filters)
+        with self._lock:
+            self._check_version(version)
+            self._expire()
+            if self._entries:
+                if self._matrix is None:
+                    self._keys = list(self._entries)
+                    self._matrix = np.stack([self._entries[k]["vec"] for k in self._keys])
+                sims = self._matrix @ q
+                # best-first so the closest compatible paraphrase wins
+                for i in np.argsort(-sims):
+                    if sims[i] < self.threshold:
+                        break
+                    key = self._keys[i]
+                    entry = self._entries[key]
+                    if entry["filters"] == scope and _jaccard(ids, entry["match_ids"]) >= self.min_overlap:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                        return entry["result"]
+            self.misses += 1
+            return None
+
+    def put(self, vec: List[float], match_ids: List[str], result: Dict[str, Any], version: str,
+            filters=None) -> None:
+        scope = filters_key(filters)
+        with self._lock:
+            self._check_version(version)
+            self._entries[self._next_key] = {
+                "vec": np.asarray(vec, dtype=np.float32),
+                "match_ids": frozenset(match_ids),
+                "filters": scope,
+                "result": result,
+                "created": time.monotonic()
+            }
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold
+            }
+
+    def _check_version(self, version: str) -> None:
+        if version != self.version:
+            self._entries.clear()
+            self._matrix = None
+            self.version = version
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        expired = [k for k, e in self._entries.items() if e["created"] < cutoff]
+        for k in expired:
+            del self._entries[k]
+        if expired:
+            self._matrix = None
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
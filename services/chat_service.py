@@ -1,219 +1,686 @@
 # services/chat_service.py
 import json
-from typing import List, Dict, Any
-from openai import OpenAI
-from sentence_transformers import SentenceTransformer
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterator, AsyncIterator, Tuple
 from pinecone import Pinecone, ServerlessSpec
 from neo4j import GraphDatabase
 import config
-
-try:
-    import google.generativeai as genai
-except Exception:
-    genai = None
+from services.vector_store import PineconeVectorStore, LocalVectorStore
+from services.embedding_cache import EmbeddingCache
+from services.answer_cache import SemanticAnswerCache
+from services.graph_meta import READ_VERSION_QUERY, UNVERSIONED, graph_etag
+from services.graph_engine import CSRGraph
+from services.lazy import LazyComponents
+from services.context_packer import pack_context
+from services.lexical_index import BM25Index, rrf_fuse
+from services.filters import normalize_filters
+from services.embedders import load_embedder
+from services.embedding_server import EmbeddingClient
+from services.micro_batcher import MicroBatcher
+from services.concurrency import run_blocking_stream
+from services.metrics import stage, record_exchange, with_timings, add_timings
+from services.llm_providers import load_provider
+from services.single_flight import SingleFlight, query_key
+from services.neighbor_cache import NeighborCache
 
 # -----------------------------
 # Config
 # -----------------------------
 EMBED_MODEL = "BAAI/bge-m3"
-CHAT_PROVIDER = getattr(config, "CHAT_PROVIDER", "openai").lower()
-CHAT_MODEL = (
-    "gpt-4o-mini" if CHAT_PROVIDER == "openai" else "gemini-2.5-flash"
-)
 TOP_K = 5
+CONTEXT_TOKEN_BUDGET = getattr(config, "CONTEXT_TOKEN_BUDGET", 1200)
+RETRIEVAL_MODE = getattr(config, "RETRIEVAL_MODE", "dense").lower()
+NEIGHBOR_LIMIT = 10
+MAX_NEIGHBORHOOD_DEPTH = getattr(config, "MAX_NEIGHBORHOOD_DEPTH", 3)
 INDEX_NAME = config.PINECONE_INDEX_NAME
+VECTOR_BACKEND = getattr(config, "VECTOR_BACKEND", "pinecone").lower()
+LOCAL_INDEX_PATH = getattr(config, "LOCAL_INDEX_PATH", "data/local_index")
+GRAPH_BACKEND = getattr(config, "GRAPH_BACKEND", "neo4j").lower()
+DATA_FILE = "vietnam_travel_dataset.json"
+EMBED_SERVER_SOCKET = getattr(config, "EMBED_SERVER_SOCKET", None)
+EMBED_MICRO_BATCHING = getattr(config, "EMBED_MICRO_BATCHING", True)
+EMBED_BATCH_MAX_SIZE = getattr(config, "EMBED_BATCH_MAX_SIZE", 32)
+EMBED_BATCH_MAX_WAIT_MS = getattr(config, "EMBED_BATCH_MAX_WAIT_MS", 5)
+EMBED_CACHE_SIZE = getattr(config, "EMBED_CACHE_SIZE", 1024)
+EMBED_CACHE_PATH = getattr(config, "EMBED_CACHE_PATH", None)
+GRAPH_VERSION_TTL = getattr(config, "GRAPH_VERSION_TTL", 30)
+ANSWER_CACHE_ENABLED = getattr(config, "ANSWER_CACHE_ENABLED", True)
+ANSWER_CACHE_THRESHOLD = getattr(config, "ANSWER_CACHE_THRESHOLD", 0.92)
+ANSWER_CACHE_MIN_OVERLAP = getattr(config, "ANSWER_CACHE_MIN_OVERLAP", 0.6)
+ANSWER_CACHE_TTL = getattr(config, "ANSWER_CACHE_TTL", 3600)
+ANSWER_CACHE_SIZE = getattr(config, "ANSWER_CACHE_SIZE", 512)
+BATCH_LLM_CONCURRENCY = getattr(config, "BATCH_LLM_CONCURRENCY", 4)
+SINGLE_FLIGHT_ENABLED = getattr(config, "SINGLE_FLIGHT_ENABLED", True)
+NEIGHBOR_CACHE_ENABLED = getattr(config, "NEIGHBOR_CACHE_ENABLED", True)
+NEIGHBOR_CACHE_SIZE = getattr(config, "NEIGHBOR_CACHE_SIZE", 4096)
+
+def format_matches(matches) -> List[Dict[str, Any]]:
+    """Plain id/score/metadata dicts for API responses."""
+    return [
+        {
+            "id": m["id"],
+            "score": m.get("score", 0),
+            "metadata": m.get("metadata", {})
+        }
+        for m in matches
+    ]
+
+class ChatService(LazyComponents):
+    """Hybrid RAG pipeline.
+
+    Construction is cheap: the embedding model, vector store, graph backend
+    and chat client are built on first use (or by warmup()), so importing
+    this module does not load model weights or open network connections.
 
-class ChatService:
-    def __init__(self):
-        self.client = None
-        self.embedder = SentenceTransformer(EMBED_MODEL)
-        
-        # Configure Google Gemini client (preferred)
-        if CHAT_PROVIDER == "google":
-            if not genai:
-                raise ImportError("google-generativeai is not installed. Please install it from requirements.txt")
-            if not getattr(config, "GOOGLE_API_KEY", None):
-                raise ValueError("GOOGLE_API_KEY is not set in config.py but CHAT_PROVIDER is 'google'.")
-            genai.configure(api_key=config.GOOGLE_API_KEY)
+    Components passed to the constructor are used as-is instead of being
+    built from config (see benchmarks/stand_ins.py and
+    llm_providers.FakeProvider). Passing ``graph``
+    selects the in-process graph and passing ``driver`` selects Neo4j,
+    whatever GRAPH_BACKEND says.
+    """
+
+    def __init__(self, embedder=None, vector_store=None, lexical_index=None, graph=None, driver=None, llm=None):
+        # the BM25 index is only built on demand in dense mode
+        self._init_components(
+            ["embedder", "vector_store", "lexical_index", "graph", "chat_client"],
+            optional=["lexical_index"] if RETRIEVAL_MODE == "dense" else []
+        )
+        self._embedder = embedder
+        self._vector_store = vector_store
+        self._lexical_index = lexical_index
+        self._driver = driver
+        self._llm = llm
+        self._graph = graph  # local graph; also used when Neo4j is unreachable at warmup
+        if graph is not None:
+            self.graph_backend = "local"
+        elif driver is not None:
+            self.graph_backend = "neo4j"
         else:
-            # Fallback to OpenAI if explicitly requested
-            self.client = OpenAI(api_key=config.OPENAI_API_KEY)
+            self.graph_backend = GRAPH_BACKEND
+        self.embed_cache = EmbeddingCache(EMBED_MODEL, max_entries=EMBED_CACHE_SIZE, path=EMBED_CACHE_PATH)
+        self.answer_cache = SemanticAnswerCache(
+            threshold=ANSWER_CACHE_THRESHOLD,
+            ttl=ANSWER_CACHE_TTL,
+            max_entries=ANSWER_CACHE_SIZE,
+            min_overlap=ANSWER_CACHE_MIN_OVERLAP
+        ) if ANSWER_CACHE_ENABLED else None
+        self._graph_version = None
+        self._graph_version_checked = 0.0
+        self._graph_version_lock = threading.Lock()
+        self.micro_batching = EMBED_MICRO_BATCHING
+        self.single_flight = SingleFlight() if SINGLE_FLIGHT_ENABLED else None
+        self.neighbor_cache = NeighborCache(max_entries=NEIGHBOR_CACHE_SIZE) if NEIGHBOR_CACHE_ENABLED else None
+
+    # -----------------------------
+    # Lazily constructed components
+    # -----------------------------
+    @property
+    def embedder(self):
+        """BGE-M3 model, or a client for the shared embedding server when EMBED_SERVER_SOCKET is set."""
+        if EMBED_SERVER_SOCKET:
+            return self._lazy("_embedder", lambda: EmbeddingClient(EMBED_SERVER_SOCKET))
+        return self._lazy("_embedder", lambda: load_embedder(model=EMBED_MODEL))
+
+    @property
+    def batcher(self):
+        """Micro-batcher that coalesces concurrent query encodes into one embedder call."""
+        return self._lazy("_batcher", lambda: MicroBatcher(
+            lambda texts: self.embedder.encode(texts, normalize_embeddings=True),
+            max_batch=EMBED_BATCH_MAX_SIZE,
+            max_wait_ms=EMBED_BATCH_MAX_WAIT_MS
+        ))
+
+    @property
+    def llm(self):
+        """Chat provider (services/llm_providers.py); one pooled client per service."""
+        return self._lazy("_llm", load_provider, component="chat_client")
+
+    @property
+    def vector_store(self):
+        return self._lazy("_vector_store", self._make_vector_store)
+
+    @property
+    def lexical_index(self):
+        return self._lazy("_lexical_index", lambda: BM25Index.from_file(DATA_FILE))
+
+    @property
+    def index(self):
+        """Underlying Pinecone index (None for the local backend)."""
+        return getattr(self.vector_store, "index", None)
+
+    @property
+    def driver(self):
+        return self._lazy("_driver", self._connect_neo4j, component="graph")
+
+    def _connect_neo4j(self):
+        # GraphDatabase.driver() never connects; verify before "graph" counts as
+        # ready, and leave nothing cached so the next access retries
+        driver = GraphDatabase.driver(config.NEO4J_URI, auth=(config.NEO4J_USER, config.NEO4J_PASSWORD))
+        try:
+            driver.verify_connectivity()
+        except Exception:
+            driver.close()
+            raise
+        return driver
+
+    @property
+    def graph(self):
+        """In-process graph when GRAPH_BACKEND is 'local' (or Neo4j was unreachable), else None."""
+        if self.graph_backend == "local":
+            return self._lazy("_graph", lambda: CSRGraph.from_file(DATA_FILE))
+        return self._graph
+
+    def _make_vector_store(self):
+        if VECTOR_BACKEND == "local":
+            # Local memory-mapped index (see build_local_index.py); no network hop
+            return LocalVectorStore(LOCAL_INDEX_PATH)
+
+        pc = Pinecone(api_key=config.PINECONE_API_KEY)
 
-        self.pc = Pinecone(api_key=config.PINECONE_API_KEY)
-        
         # Connect to Pinecone index
-        if INDEX_NAME not in self.pc.list_indexes().names():
+        if INDEX_NAME not in pc.list_indexes().names():
             print(f"Creating managed index: {INDEX_NAME}")
-            self.pc.create_index(
+            pc.create_index(
                 name=INDEX_NAME,
                 dimension=config.PINECONE_VECTOR_DIM,
                 metric="cosine",
                 spec=ServerlessSpec(cloud=getattr(config, "PINECONE_CLOUD", "gcp"), region=getattr(config, "PINECONE_ENV", "us-east1"))
             )
 
-        self.index = self.pc.Index(INDEX_NAME)
+        return PineconeVectorStore(pc.Index(INDEX_NAME))
 
-        # Connect to Neo4j
-        self.driver = GraphDatabase.driver(
-            config.NEO4J_URI, auth=(config.NEO4J_USER, config.NEO4J_PASSWORD)
-        )
+    def warmup(self) -> Dict[str, Any]:
+        """Build every component and exercise it once (one encode, one query).
+
+        The BM25 index is skipped in dense mode, where it is built on demand.
+        If Neo4j is unreachable the service degrades to the in-process graph
+        rather than failing requests.
+        """
+        vec = self._warm("embedder", lambda: self.embedder.encode(["warmup"], normalize_embeddings=True)[0].tolist())
+        if vec is not None:
+            matches = self._warm("vector_store", lambda: self.vector_store.query(vec, 1))
+        else:
+            self._readiness["vector_store"]["error"] = "embedder not ready"
+            matches = None
+        probe_ids = [m["id"] for m in matches or []]
+        if RETRIEVAL_MODE != "dense":
+            self._warm("lexical_index", lambda: self.lexical_index.search("warmup", 1))
+
+        def warm_graph():
+            if self.graph is None:
+                try:
+                    self.driver.verify_connectivity()
+                except Exception as e:
+                    print(f"⚠️ Neo4j not available, serving graph facts from the local graph: {e}")
+                    self._graph = CSRGraph.from_file(DATA_FILE)
+            self.graph_version()
+            return self.fetch_graph_context(probe_ids)
+        self._warm("graph", warm_graph)
+        # open the provider's connection now so the first chat skips the TLS handshake
+        self._warm("chat_client", lambda: self.llm.connect())
+        return self.readiness()
+
+    def readiness(self) -> Dict[str, Any]:
+        state = super().readiness()
+        state["graph_backend"] = "neo4j" if self.graph is None else "local"
+        return state
 
     def embed_text(self, text: str) -> List[float]:
-        """Get embedding for a text string using BGE-M3."""
-        vec = self.embedder.encode([text], normalize_embeddings=True)[0]
-        return vec.tolist() if hasattr(vec, "tolist") else list(vec)
+        """Get embedding for a text string using BGE-M3 (cached by normalized text)."""
+        cached = self.embed_cache.get(text)
+        if cached is not None:
+            return cached
+        if self.micro_batching:
+            vec = self.batcher.encode(text)
+        else:
+            vec = self.embedder.encode([text], normalize_embeddings=True)[0]
+        vec = vec.tolist() if hasattr(vec, "tolist") else list(vec)
+        self.embed_cache.put(text, vec)
+        return vec
 
-    def pinecone_query(self, query_text: str, top_k=TOP_K):
-        """Query Pinecone index using embedding."""
+    def pinecone_query(self, query_text: str, top_k=TOP_K, filters=None):
+        """Query the configured vector store (Pinecone or local) using embedding."""
         vec = self.embed_text(query_text)
-        res = self.index.query(
-            vector=vec,
-            top_k=top_k,
-            include_metadata=True,
-            include_values=False
-        )
-        return res["matches"]
+        return self.vector_store.query(vec, top_k, filters=filters)
+
+    def search(self, query: str, top_k=TOP_K, mode=None, filters=None):
+        """Retrieve matches with dense, lexical (BM25) or hybrid (RRF-fused) search.
+
+        `filters` restricts results by metadata ({"type": [...], "city": [...],
+        "region": [...], "tags": [...]}); see services/filters.py.
+        """
+        mode = (mode or RETRIEVAL_MODE).lower()
+        vec = None if mode == "lexical" else self.embed_text(query)
+        return self.retrieve(query, vec, top_k, mode, filters)
+
+    def retrieve(self, query: str, vec, top_k=TOP_K, mode=None, filters=None):
+        """Like search(), reusing an already computed query embedding."""
+        mode = (mode or RETRIEVAL_MODE).lower()
+        filters = normalize_filters(filters)
+        if mode == "lexical":
+            return self.lexical_index.search(query, top_k, filters=filters)
+        if mode == "hybrid":
+            # over-fetch both lists so fusion has candidates beyond the cutoff
+            dense = self.vector_store.query(vec, top_k * 2, filters=filters)
+            lexical = self.lexical_index.search(query, top_k * 2, filters=filters)
+            return rrf_fuse([dense, lexical], top_k)
+        return self.vector_store.query(vec, top_k, filters=filters)
+
+    def cached_answer(self, vec: List[float], match_ids: List[str], filters=None):
+        """Stored result for a near-duplicate question with the same filters, or None."""
+        if self.answer_cache is None:
+            return None
+        return self.answer_cache.lookup(vec, match_ids, self.graph_version(), filters)
+
+    def remember_answer(self, vec: List[float], match_ids: List[str], result: Dict[str, Any],
+                        filters=None) -> None:
+        if self.answer_cache is not None:
+            self.answer_cache.put(vec, match_ids, result, self.graph_version(), filters)
 
     def fetch_graph_context(self, node_ids: List[str], neighborhood_depth=1):
-        """Fetch neighboring nodes from Neo4j."""
+        """Fetch neighboring nodes (up to `neighborhood_depth` hops) for all ids.
+
+        With Neo4j, facts are served per node from the neighbour cache and
+        only the misses are queried, all in one UNWIND query.
+        """
+        if not node_ids:
+            return []
+        depth = max(1, min(int(neighborhood_depth), MAX_NEIGHBORHOOD_DEPTH))
+        if self.graph is not None:
+            return self.graph.neighbour_facts(node_ids, depth=depth, limit=NEIGHBOR_LIMIT)
+        if self.neighbor_cache is None:
+            return self._query_neighbor_facts(node_ids, depth)
+
+        # per-node cache under the current graph version; misses go to Neo4j in one query
+        version = self.graph_version()
+        cached, missing = self.neighbor_cache.get_many(node_ids, depth, version)
+        if missing:
+            fetched = {nid: [] for nid in missing}
+            for fact in self._query_neighbor_facts(missing, depth):
+                fetched[fact["source"]].append(fact)
+            self.neighbor_cache.put_many(fetched, depth, version)
+            cached.update(fetched)
+        return [fact for nid in node_ids for fact in cached[nid]]
+
+    def _query_neighbor_facts(self, node_ids: List[str], depth: int) -> List[Dict[str, Any]]:
+        # Variable-length bounds cannot be parameterised, so the validated depth is inlined.
+        # Each target keeps its shortest path; `rel` is the relation that reaches it.
+        q = (
+            "UNWIND $ids AS nid "
+            "MATCH (n:Entity {id:nid}) "
+            "CALL { "
+            "  WITH n "
+            f"  MATCH p = (n)-[*1..{depth}]-(m:Entity) "
+            "  WHERE m <> n "
+            "  WITH m, p ORDER BY length(p) "
+            "  WITH m, head(collect(p)) AS p "
+            "  RETURN m, type(last(relationships(p))) AS rel, length(p) AS hops "
+            "  ORDER BY hops "
+            "  LIMIT $limit "
+            "} "
+            "RETURN nid AS source, rel, labels(m) AS labels, m.id AS id, "
+            "m.name AS name, m.type AS type, m.description AS description"
+        )
         facts = []
         with self.driver.session() as session:
-            for nid in node_ids:
-                q = (
-                    "MATCH (n:Entity {id:$nid})-[r]-(m:Entity) "
-                    "RETURN type(r) AS rel, labels(m) AS labels, m.id AS id, "
-                    "m.name AS name, m.type AS type, m.description AS description "
-                    "LIMIT 10"
-                )
-                recs = session.run(q, nid=nid)
-                for r in recs:
-                    facts.append({
-                        "source": nid,
-                        "rel": r["rel"],
-                        "target_id": r["id"],
-                        "target_name": r["name"],
-                        "target_desc": (r["description"] or "")[:400],
-                        "labels": r["labels"]
-                    })
+            recs = session.run(q, ids=list(node_ids), limit=NEIGHBOR_LIMIT)
+            for r in recs:
+                facts.append({
+                    "source": r["source"],
+                    "rel": r["rel"],
+                    "target_id": r["id"],
+                    "target_name": r["name"],
+                    "target_desc": (r["description"] or "")[:400],
+                    "labels": r["labels"]
+                })
         return facts
 
     def build_prompt(self, user_query, pinecone_matches, graph_facts):
         """Build a chat prompt combining vector DB matches and graph facts."""
+        return self.build_prompt_with_stats(user_query, pinecone_matches, graph_facts)[0]
+
+    def build_prompt_with_stats(self, user_query, pinecone_matches, graph_facts):
+        """Like build_prompt, but also return the context packing stats.
+
+        Facts are de-duplicated by target and matches/facts are packed by
+        relevance into CONTEXT_TOKEN_BUDGET tokens.
+        """
         system = (
             "You are a helpful travel assistant. Use the provided semantic search results "
             "and graph facts to answer the user's query briefly and concisely. "
             "Cite node ids when referencing specific places or attractions."
         )
 
-        vec_context = []
-        for m in pinecone_matches:
-            meta = m["metadata"]
-            score = m.get("score", None)
-            snippet = f"- id: {m['id']}, name: {meta.get('name','')}, type: {meta.get('type','')}, score: {score}"
-            if meta.get("city"):
-                snippet += f", city: {meta.get('city')}"
-            vec_context.append(snippet)
-
-        graph_context = [
-            f"- ({f['source']}) -[{f['rel']}]-> ({f['target_id']}) {f['target_name']}: {f['target_desc']}"
-            for f in graph_facts
-        ]
+        packed = pack_context(pinecone_matches, list(graph_facts), CONTEXT_TOKEN_BUDGET)
 
         prompt = [
             {"role": "system", "content": system},
             {"role": "user", "content":
              f"User query: {user_query}\n\n"
-             "Top semantic matches (from vector DB):\n" + "\n".join(vec_context[:10]) + "\n\n"
-             "Graph facts (neighboring relations):\n" + "\n".join(graph_context[:20]) + "\n\n"
+             "Top semantic matches (from vector DB):\n" + "\n".join(packed["match_lines"]) + "\n\n"
+             "Graph facts (neighboring relations):\n" + "\n".join(packed["fact_lines"]) + "\n\n"
              "Based on the above, answer the user's question. If helpful, suggest 2–3 concrete itinerary steps or tips and mention node ids for references."}
         ]
-        return prompt
+        return prompt, packed
 
     def call_chat(self, prompt_messages):
-        """Call the selected chat provider (Google Gemini or OpenAI)."""
-        # Google Gemini path (preferred)
-        if CHAT_PROVIDER == "google":
-            model = genai.GenerativeModel(CHAT_MODEL)
-            # Convert messages into a single text prompt; keep roles for clarity
-            joined = []
-            for m in prompt_messages:
-                role = m.get("role", "user")
-                content = m.get("content", "")
-                joined.append(f"{role.upper()}: {content}")
-            prompt_text = "\n\n".join(joined)
-            resp = model.generate_content(prompt_text)
-            return getattr(resp, "text", "") or getattr(resp, "candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "")
-        
-        # OpenAI fallback
-        resp = self.client.chat.completions.create(
-            model=CHAT_MODEL,
-            messages=prompt_messages,
-            max_tokens=600,
-            temperature=0.2
+        """Call the configured chat provider."""
+        return self.llm.complete(prompt_messages)
+
+    def call_chat_stream(self, prompt_messages) -> Iterator[str]:
+        """Stream answer text chunks from the chat provider as they are generated."""
+        return self.llm.stream(prompt_messages)
+
+    def process_query(self, query: str, filters=None) -> Dict[str, Any]:
+        """Process a user query and return structured response.
+
+        Concurrent calls with the same normalised query and filters share
+        one pipeline run (and the same result object). The leader's stage
+        timings are shared too, so every caller's with_timings() breakdown
+        describes the run it got its answer from.
+        """
+        if self.single_flight is None:
+            return self._process_query(query, filters)
+        result, timings = self.single_flight.do(
+            query_key(query, filters), with_timings, self._process_query, query, filters
         )
-        return resp.choices[0].message.content
+        add_timings(timings)
+        return result
+
+    def _process_query(self, query: str, filters=None) -> Dict[str, Any]:
+        with stage("total"):
+            with stage("embed"):
+                vec = self.embed_text(query)
+            with stage("retrieve"):
+                matches = self.retrieve(query, vec, TOP_K, filters=filters)
+            match_ids = [m["id"] for m in matches]
+            with stage("answer_cache"):
+                cached = self.cached_answer(vec, match_ids, filters)
+            if cached is not None:
+                return cached
 
-    def process_query(self, query: str) -> Dict[str, Any]:
-        """Process a user query and return structured response."""
-        matches = self.pinecone_query(query, top_k=TOP_K)
+            with stage("graph"):
+                graph_facts = self.fetch_graph_context(match_ids)
+            with stage("prompt"):
+                prompt, packed = self.build_prompt_with_stats(query, matches, graph_facts)
+            with stage("llm"):
+                answer = self.call_chat(prompt)
+            record_exchange(prompt, packed["tokens"], answer)
+
+            result = {
+                "answer": answer,
+                "matches": format_matches(matches),
+                "graph_facts": graph_facts,
+                "context_tokens": packed["tokens"]
+            }
+            self.remember_answer(vec, match_ids, result, filters)
+            return result
+
+    def prepare_stream(self, query: str, filters=None) -> Dict[str, Any]:
+        """Blocking first half of a streamed answer: retrieval, graph facts and prompt.
+
+        Returns the ``context`` event data plus either a cached ``answer`` or
+        the ``prompt`` (and what finish_stream needs) for the LLM call.
+        """
+        with stage("embed"):
+            vec = self.embed_text(query)
+        with stage("retrieve"):
+            matches = self.retrieve(query, vec, TOP_K, filters=filters)
         match_ids = [m["id"] for m in matches]
-        graph_facts = self.fetch_graph_context(match_ids)
-        prompt = self.build_prompt(query, matches, graph_facts)
-        answer = self.call_chat(prompt)
-        
+        with stage("answer_cache"):
+            cached = self.cached_answer(vec, match_ids, filters)
+        if cached is not None:
+            return {
+                "context": {
+                    "matches": cached["matches"],
+                    "graph_facts": cached["graph_facts"],
+                    "context_tokens": cached.get("context_tokens")
+                },
+                "answer": cached["answer"]
+            }
+
+        with stage("graph"):
+            graph_facts = self.fetch_graph_context(match_ids)
+        with stage("prompt"):
+            prompt, packed = self.build_prompt_with_stats(query, matches, graph_facts)
         return {
-            "answer": answer,
-            "matches": [
-                {
-                    "id": m["id"],
-                    "score": m.get("score", 0),
-                    "metadata": m.get("metadata", {})
-                }
-                for m in matches
-            ],
-            "graph_facts": graph_facts
+            "context": {
+                "matches": format_matches(matches),
+                "graph_facts": graph_facts,
+                "context_tokens": packed["tokens"]
+            },
+            "prompt": prompt,
+            "vec": vec,
+            "match_ids": match_ids,
+            "filters": filters,
+            "llm": self.llm  # built here, off the event loop
         }
 
+    def finish_stream(self, plan: Dict[str, Any], answer: str) -> None:
+        """Record a streamed answer and store it in the answer cache."""
+        record_exchange(plan["prompt"], plan["context"]["context_tokens"], answer)
+        self.remember_answer(
+            plan["vec"], plan["match_ids"], dict(plan["context"], answer=answer), plan["filters"]
+        )
+
+    def stream_query(self, query: str, filters=None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Process a query as a stream of (event, data) pairs.
+
+        Retrieval results are emitted first as a ``context`` event, followed
+        by ``token`` events as the answer is generated and a final ``done``.
+        """
+        plan = self.prepare_stream(query, filters)
+        yield "context", plan["context"]
+        if "answer" in plan:
+            yield "token", {"text": plan["answer"]}
+            yield "done", {}
+            return
+
+        chunks = []
+        # includes the time the client takes to consume each token event
+        with stage("llm_stream"):
+            for text in self.call_chat_stream(plan["prompt"]):
+                chunks.append(text)
+                yield "token", {"text": text}
+        self.finish_stream(plan, "".join(chunks))
+        yield "done", {}
+
+    async def astream_query(self, query: str, filters=None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """stream_query() for the event loop.
+
+        Retrieval runs on the stream worker pool; tokens come from the provider's
+        async stream, so an open stream holds no thread.
+        """
+        plan = await run_blocking_stream(self.prepare_stream, query, filters)
+        yield "context", plan["context"]
+        if "answer" in plan:
+            yield "token", {"text": plan["answer"]}
+            yield "done", {}
+            return
+
+        chunks = []
+        with stage("llm_stream"):
+            async for text in plan["llm"].astream(plan["prompt"]):
+                chunks.append(text)
+                yield "token", {"text": text}
+        await run_blocking_stream(self.finish_stream, plan, "".join(chunks))
+        yield "done", {}
+
+    # -----------------------------
+    # Batch pipeline
+    # -----------------------------
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings for many texts; cache misses are encoded in one embedder call."""
+        vecs = [self.embed_cache.get(t) for t in texts]
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vecs) if v is None))
+        if missing:
+            encoded = {}
+            for text, vec in zip(missing, self.embedder.encode(missing, normalize_embeddings=True)):
+                vec = vec.tolist() if hasattr(vec, "tolist") else list(vec)
+                self.embed_cache.put(text, vec)
+                encoded[text] = vec
+            vecs = [v if v is not None else encoded[t] for t, v in zip(texts, vecs)]
+        return vecs
+
+    def retrieve_many(self, queries: List[str], vecs, top_k=TOP_K, mode=None, filters=None):
+        """retrieve() for many queries; dense lookups go to the vector store in bulk."""
+        mode = (mode or RETRIEVAL_MODE).lower()
+        filters = normalize_filters(filters)
+        if mode == "lexical":
+            return [self.lexical_index.search(q, top_k, filters=filters) for q in queries]
+        if mode == "hybrid":
+            dense = self.vector_store.query_many(vecs, top_k * 2, filters=filters)
+            return [
+                rrf_fuse([d, self.lexical_index.search(q, top_k * 2, filters=filters)], top_k)
+                for q, d in zip(queries, dense)
+            ]
+        return self.vector_store.query_many(vecs, top_k, filters=filters)
+
+    def search_batch(self, queries: List[str], top_k=TOP_K, mode=None, filters=None) -> List[Dict[str, Any]]:
+        """search() for many queries: one encode call and one bulk vector lookup."""
+        mode = (mode or RETRIEVAL_MODE).lower()
+        vecs = None if mode == "lexical" else self.embed_texts(queries)
+        return [
+            {"matches": format_matches(matches)}
+            for matches in self.retrieve_many(queries, vecs, top_k, mode, filters)
+        ]
+
+    def process_batch(self, queries: List[str], filters=None) -> List[Dict[str, Any]]:
+        """process_query() for many queries.
+
+        Encoding, vector lookup and graph expansion are done once for the
+        whole batch; LLM calls run BATCH_LLM_CONCURRENCY at a time. A failed
+        item gets an ``error`` entry instead of failing the batch.
+        """
+        vecs = self.embed_texts(queries)
+        all_matches = self.retrieve_many(queries, vecs, TOP_K, filters=filters)
+
+        results: List[Dict[str, Any]] = [None] * len(queries)
+        pending = []
+        for i, (vec, matches) in enumerate(zip(vecs, all_matches)):
+            cached = self.cached_answer(vec, [m["id"] for m in matches], filters)
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.append(i)
+        if not pending:
+            return results
+
+        # one graph query for every match id, split back out by source
+        node_ids = list(dict.fromkeys(m["id"] for i in pending for m in all_matches[i]))
+        facts_by_source = defaultdict(list)
+        for f in self.fetch_graph_context(node_ids):
+            facts_by_source[f["source"]].append(f)
+
+        def answer(i):
+            matches = all_matches[i]
+            graph_facts = [f for m in matches for f in facts_by_source.get(m["id"], [])]
+            prompt, packed = self.build_prompt_with_stats(queries[i], matches, graph_facts)
+            result = {
+                "answer": self.call_chat(prompt),
+                "matches": format_matches(matches),
+                "graph_facts": graph_facts,
+                "context_tokens": packed["tokens"]
+            }
+            self.remember_answer(vecs[i], [m["id"] for m in matches], result, filters)
+            return result
+
+        with ThreadPoolExecutor(max_workers=max(1, min(BATCH_LLM_CONCURRENCY, len(pending)))) as pool:
+            futures = [(i, pool.submit(answer, i)) for i in pending]
+            for i, future in futures:
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    results[i] = {"error": f"Error processing query: {e}"}
+        return results
+
     def get_graph_data(self, node_ids: List[str]) -> Dict[str, Any]:
-        """Get graph data for visualization."""
+        """Get graph data (nodes plus edges among them) for visualization in one query."""
+        if self.graph is not None:
+            return self.graph.subgraph(node_ids)
+
         nodes = []
         edges = []
-        
+
+        q = (
+            "MATCH (n:Entity) WHERE n.id IN $node_ids "
+            "OPTIONAL MATCH (n)-[r]-(m:Entity) WHERE m.id IN $node_ids "
+            "RETURN n.id AS id, n.name AS name, n.type AS type, labels(n) AS labels, "
+            "collect(CASE WHEN m IS NULL THEN NULL ELSE {to: m.id, label: type(r)} END) AS links"
+        )
         with self.driver.session() as session:
-            # Get nodes
-            for nid in node_ids:
-                q = "MATCH (n:Entity {id:$nid}) RETURN n.id AS id, n.name AS name, n.type AS type, labels(n) AS labels"
-                recs = session.run(q, nid=nid)
-                for r in recs:
-                    nodes.append({
-                        "id": r["id"],
-                        "label": r["name"],
-                        "group": r["type"],
-                        "title": f"{r['name']} ({', '.join(r['labels'])})"
-                    })
-            
-            # Get edges
-            for nid in node_ids:
-                q = (
-                    "MATCH (n:Entity {id:$nid})-[r]-(m:Entity) "
-                    "WHERE m.id IN $node_ids "
-                    "RETURN n.id AS from, m.id AS to, type(r) AS label"
-                )
-                recs = session.run(q, nid=nid, node_ids=node_ids)
-                for r in recs:
+            recs = session.run(q, node_ids=list(node_ids))
+            for r in recs:
+                nodes.append({
+                    "id": r["id"],
+                    "label": r["name"],
+                    "group": r["type"],
+                    "title": f"{r['name']} ({', '.join(r['labels'])})"
+                })
+                for link in r["links"]:
                     edges.append({
-                        "from": r["from"],
-                        "to": r["to"],
-                        "label": r["label"],
+                        "from": r["id"],
+                        "to": link["to"],
+                        "label": link["label"],
                         "arrows": "to"
                     })
-        
+
         return {"nodes": nodes, "edges": edges}
 
+    def graph_version(self) -> str:
+        """Version stamp written by load_to_neo4j.py, re-read at most every GRAPH_VERSION_TTL seconds."""
+        if self.graph is not None:
+            return self.graph.version
+        now = time.monotonic()
+        if self._graph_version is not None and now - self._graph_version_checked < GRAPH_VERSION_TTL:
+            return self._graph_version
+        with self._graph_version_lock:
+            if self._graph_version is None or now - self._graph_version_checked >= GRAPH_VERSION_TTL:
+                with self.driver.session() as session:
+                    rec = session.run(READ_VERSION_QUERY).single()
+                self._graph_version = (rec and rec["version"]) or UNVERSIONED
+                self._graph_version_checked = now
+        return self._graph_version
+
+    def graph_etag(self, node_ids: List[str]) -> str:
+        """ETag for get_graph_data(node_ids) under the current graph version."""
+        return graph_etag(self.graph_version(), node_ids)
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters for monitoring."""
+        stats = {"embedding_cache": self.embed_cache.stats()}
+        if self.answer_cache is not None:
+            stats["answer_cache"] = self.answer_cache.stats()
+        batcher = self.__dict__.get("_batcher")
+        if batcher is not None:
+            stats["embed_batching"] = batcher.stats()
+        if self.single_flight is not None:
+            stats["single_flight"] = self.single_flight.stats()
+        if self.neighbor_cache is not None:
+            stats["neighbor_cache"] = self.neighbor_cache.stats()
+        return stats
+
     def close(self):
         """Close database connections."""
-        if hasattr(self, 'driver'):
-            self.driver.close()
+        driver = self.__dict__.get("_driver")
+        if driver is not None:
+            driver.close()
+        batcher = self.__dict__.get("_batcher")
+        if batcher is not None:
+            batcher.close()
+        self.embed_cache.close()
+        llm = self.__dict__.get("_llm")
+        if llm is not None:
+            llm.close()
+
+    async def aclose(self):
+        """Close the chat provider's async connections (call before close())."""
+        llm = self.__dict__.get("_llm")
+        if llm is not None:
+            await llm.aclose()
 
 # Global instance
 chat_service = ChatService()
@@ -1,151 +1,335 @@
 # services/chat_service_fallback.py
-# Fallback version that works without Neo4j for testing purposes
+# Fallback version that works without Neo4j: graph facts come from the
+# in-process CSR graph built from the dataset file
 
 import json
-from typing import List, Dict, Any
-from openai import OpenAI
-from sentence_transformers import SentenceTransformer
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterator, AsyncIterator, Tuple
 from pinecone import Pinecone, ServerlessSpec
 import config
-
-try:
-    import google.generativeai as genai
-except Exception:
-    genai = None
+from services.graph_meta import graph_etag
+from services.graph_engine import CSRGraph
+from services.lazy import LazyComponents
+from services.context_packer import pack_context
+from services.lexical_index import BM25Index, rrf_fuse
+from services.filters import normalize_filters, to_pinecone_filter
+from services.vector_store import PineconeVectorStore
+from services.embedders import load_embedder
+from services.metrics import stage, record_exchange, with_timings, add_timings
+from services.llm_providers import load_provider
+from services.single_flight import SingleFlight, query_key
+from services.concurrency import run_blocking_stream
 
 # -----------------------------
 # Config
 # -----------------------------
 EMBED_MODEL = "BAAI/bge-m3"
-CHAT_PROVIDER = getattr(config, "CHAT_PROVIDER", "openai").lower()
-CHAT_MODEL = (
-    "gpt-4o-mini" if CHAT_PROVIDER == "openai" else "gemini-2.5-flash"
-)
 TOP_K = 5
+CONTEXT_TOKEN_BUDGET = getattr(config, "CONTEXT_TOKEN_BUDGET", 1200)
+RETRIEVAL_MODE = getattr(config, "RETRIEVAL_MODE", "dense").lower()
+NEIGHBOR_LIMIT = 10
 INDEX_NAME = config.PINECONE_INDEX_NAME
+DATA_FILE = "vietnam_travel_dataset.json"
+BATCH_LLM_CONCURRENCY = getattr(config, "BATCH_LLM_CONCURRENCY", 4)
+SINGLE_FLIGHT_ENABLED = getattr(config, "SINGLE_FLIGHT_ENABLED", True)
+
+def format_matches(matches) -> List[Dict[str, Any]]:
+    """Plain id/score/metadata dicts for API responses."""
+    return [
+        {
+            "id": m["id"],
+            "score": m.get("score", 0),
+            "metadata": m.get("metadata", {})
+        }
+        for m in matches
+    ]
+
+class ChatServiceFallback(LazyComponents):
+    """Pinecone + in-process graph variant; components are built on first use."""
 
-class ChatServiceFallback:
     def __init__(self):
-        self.client = None
-        self.embedder = SentenceTransformer(EMBED_MODEL)
-        
-        # Configure Google Gemini client (preferred)
-        if CHAT_PROVIDER == "google":
-            if not genai:
-                raise ImportError("google-generativeai is not installed. Please install it from requirements.txt")
-            if not getattr(config, "GOOGLE_API_KEY", None):
-                raise ValueError("GOOGLE_API_KEY is not set in config.py but CHAT_PROVIDER is 'google'.")
-            genai.configure(api_key=config.GOOGLE_API_KEY)
-        else:
-            # Fallback to OpenAI if explicitly requested
-            self.client = OpenAI(api_key=config.OPENAI_API_KEY)
-
-        self.pc = Pinecone(api_key=config.PINECONE_API_KEY)
+        # the BM25 index is only built on demand in dense mode
+        self._init_components(
+            ["embedder", "vector_store", "lexical_index", "graph", "chat_client"],
+            optional=["lexical_index"] if RETRIEVAL_MODE == "dense" else []
+        )
+        self.single_flight = SingleFlight() if SINGLE_FLIGHT_ENABLED else None
+
+    @property
+    def embedder(self):
+        return self._lazy("_embedder", lambda: load_embedder(model=EMBED_MODEL))
+
+    @property
+    def llm(self):
+        """Chat provider (services/llm_providers.py); one pooled client per service."""
+        return self._lazy("_llm", load_provider, component="chat_client")
+
+    @property
+    def index(self):
+        return self._lazy("_index", self._make_index, component="vector_store")
+
+    @property
+    def lexical_index(self):
+        return self._lazy("_lexical_index", lambda: BM25Index.from_file(DATA_FILE))
+
+    @property
+    def graph(self):
+        # Local graph in place of Neo4j
+        return self._lazy("_graph", lambda: CSRGraph.from_file(DATA_FILE))
+
+    def _make_index(self):
+        pc = Pinecone(api_key=config.PINECONE_API_KEY)
         
         # Connect to Pinecone index
-        if INDEX_NAME not in self.pc.list_indexes().names():
+        if INDEX_NAME not in pc.list_indexes().names():
             print(f"Creating managed index: {INDEX_NAME}")
-            self.pc.create_index(
+            pc.create_index(
                 name=INDEX_NAME,
                 dimension=config.PINECONE_VECTOR_DIM,
                 metric="cosine",
                 spec=ServerlessSpec(cloud=getattr(config, "PINECONE_CLOUD", "gcp"), region=getattr(config, "PINECONE_ENV", "us-east1"))
             )
 
-        self.index = self.pc.Index(INDEX_NAME)
+        return pc.Index(INDEX_NAME)
+
+    def warmup(self) -> Dict[str, Any]:
+        """Build every component and exercise it once (one encode, one query).
+
+        The BM25 index is skipped in dense mode, where it is built on demand.
+        """
+        self._warm("embedder", lambda: self.embed_text("warmup"))
+        matches = self._warm("vector_store", lambda: self.pinecone_query("warmup", top_k=1))
+        if RETRIEVAL_MODE != "dense":
+            self._warm("lexical_index", lambda: self.lexical_index.search("warmup", 1))
+        self._warm("graph", lambda: self.fetch_graph_context([m["id"] for m in matches or []]))
+        # open the provider's connection now so the first chat skips the TLS handshake
+        self._warm("chat_client", lambda: self.llm.connect())
+        return self.readiness()
+
+    def readiness(self) -> Dict[str, Any]:
+        state = super().readiness()
+        state["graph_backend"] = "local"
+        return state
 
     def embed_text(self, text: str) -> List[float]:
         """Get embedding for a text string using BGE-M3."""
         vec = self.embedder.encode([text], normalize_embeddings=True)[0]
         return vec.tolist() if hasattr(vec, "tolist") else list(vec)
 
-    def pinecone_query(self, query_text: str, top_k=TOP_K):
+    def pinecone_query(self, query_text: str, top_k=TOP_K, filters=None):
         """Query Pinecone index using embedding."""
         vec = self.embed_text(query_text)
+        kwargs = {}
+        pinecone_filter = to_pinecone_filter(filters)
+        if pinecone_filter:
+            kwargs["filter"] = pinecone_filter
         res = self.index.query(
             vector=vec,
             top_k=top_k,
             include_metadata=True,
-            include_values=False
+            include_values=False,
+            **kwargs
         )
         return res["matches"]
 
-    def build_prompt(self, user_query, pinecone_matches):
-        """Build a chat prompt using only vector DB matches (no graph facts)."""
+    def search(self, query: str, top_k=TOP_K, mode=None, filters=None):
+        """Retrieve matches with dense, lexical (BM25) or hybrid (RRF-fused) search."""
+        mode = (mode or RETRIEVAL_MODE).lower()
+        filters = normalize_filters(filters)
+        if mode == "lexical":
+            return self.lexical_index.search(query, top_k, filters=filters)
+        if mode == "hybrid":
+            dense = self.pinecone_query(query, top_k=top_k * 2, filters=filters)
+            lexical = self.lexical_index.search(query, top_k * 2, filters=filters)
+            return rrf_fuse([dense, lexical], top_k)
+        return self.pinecone_query(query, top_k=top_k, filters=filters)
+
+    def fetch_graph_context(self, node_ids: List[str], neighborhood_depth=1):
+        """Fetch neighboring nodes from the in-process graph."""
+        return self.graph.neighbour_facts(node_ids, depth=neighborhood_depth, limit=NEIGHBOR_LIMIT)
+
+    def build_prompt(self, user_query, pinecone_matches, graph_facts=()):
+        """Build a chat prompt from vector DB matches and local graph facts."""
+        return self.build_prompt_with_stats(user_query, pinecone_matches, graph_facts)[0]
+
+    def build_prompt_with_stats(self, user_query, pinecone_matches, graph_facts=()):
+        """Like build_prompt, but also return the context packing stats.
+
+        Facts are de-duplicated by target and matches/facts are packed by
+        relevance into CONTEXT_TOKEN_BUDGET tokens.
+        """
         system = (
             "You are a helpful Vietnam travel assistant. Use the provided semantic search results "
-            "to answer the user's query briefly and concisely. "
+            "and graph facts to answer the user's query briefly and concisely. "
             "Focus on providing helpful travel advice about Vietnam destinations, attractions, food, and activities."
         )
 
-        vec_context = []
-        for m in pinecone_matches:
-            meta = m["metadata"]
-            score = m.get("score", None)
-            snippet = f"- id: {m['id']}, name: {meta.get('name','')}, type: {meta.get('type','')}, score: {score}"
-            if meta.get("city"):
-                snippet += f", city: {meta.get('city')}"
-            vec_context.append(snippet)
+        packed = pack_context(pinecone_matches, list(graph_facts), CONTEXT_TOKEN_BUDGET)
 
         prompt = [
             {"role": "system", "content": system},
             {"role": "user", "content":
              f"User query: {user_query}\n\n"
-             "Top semantic matches (from vector DB):\n" + "\n".join(vec_context[:10]) + "\n\n"
+             "Top semantic matches (from vector DB):\n" + "\n".join(packed["match_lines"]) + "\n\n"
+             "Graph facts (neighboring relations):\n" + "\n".join(packed["fact_lines"]) + "\n\n"
              "Based on the above, answer the user's question. If helpful, suggest 2–3 concrete itinerary steps or tips."}
         ]
-        return prompt
+        return prompt, packed
 
     def call_chat(self, prompt_messages):
-        """Call the selected chat provider (Google Gemini or OpenAI)."""
-        # Google Gemini path (preferred)
-        if CHAT_PROVIDER == "google":
-            model = genai.GenerativeModel(CHAT_MODEL)
-            # Convert messages into a single text prompt; keep roles for clarity
-            joined = []
-            for m in prompt_messages:
-                role = m.get("role", "user")
-                content = m.get("content", "")
-                joined.append(f"{role.upper()}: {content}")
-            prompt_text = "\n\n".join(joined)
-            resp = model.generate_content(prompt_text)
-            return getattr(resp, "text", "") or getattr(resp, "candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "")
-        
-        # OpenAI fallback
-        resp = self.client.chat.completions.create(
-            model=CHAT_MODEL,
-            messages=prompt_messages,
-            max_tokens=600,
-            temperature=0.2
+        """Call the configured chat provider."""
+        return self.llm.complete(prompt_messages)
+
+    def call_chat_stream(self, prompt_messages) -> Iterator[str]:
+        """Stream answer text chunks from the chat provider as they are generated."""
+        return self.llm.stream(prompt_messages)
+
+    def process_query(self, query: str, filters=None) -> Dict[str, Any]:
+        """Process a user query and return structured response.
+
+        Concurrent calls with the same normalised query and filters share
+        one pipeline run (and the same result object). The leader's stage
+        timings are shared too, so every caller's with_timings() breakdown
+        describes the run it got its answer from.
+        """
+        if self.single_flight is None:
+            return self._process_query(query, filters)
+        result, timings = self.single_flight.do(
+            query_key(query, filters), with_timings, self._process_query, query, filters
         )
-        return resp.choices[0].message.content
+        add_timings(timings)
+        return result
 
-    def process_query(self, query: str) -> Dict[str, Any]:
-        """Process a user query and return structured response (without graph data)."""
-        matches = self.pinecone_query(query, top_k=TOP_K)
-        prompt = self.build_prompt(query, matches)
-        answer = self.call_chat(prompt)
-        
+    def _process_query(self, query: str, filters=None) -> Dict[str, Any]:
+        with stage("total"):
+            # embedding happens inside search() here, so "retrieve" includes it
+            with stage("retrieve"):
+                matches = self.search(query, top_k=TOP_K, filters=filters)
+            with stage("graph"):
+                graph_facts = self.fetch_graph_context([m["id"] for m in matches])
+            with stage("prompt"):
+                prompt, packed = self.build_prompt_with_stats(query, matches, graph_facts)
+            with stage("llm"):
+                answer = self.call_chat(prompt)
+            record_exchange(prompt, packed["tokens"], answer)
+
+            return {
+                "answer": answer,
+                "matches": format_matches(matches),
+                "graph_facts": graph_facts,
+                "context_tokens": packed["tokens"]
+            }
+
+    def prepare_stream(self, query: str, filters=None) -> Dict[str, Any]:
+        """Blocking first half of a streamed answer: retrieval, graph facts and prompt."""
+        matches = self.search(query, top_k=TOP_K, filters=filters)
+        graph_facts = self.fetch_graph_context([m["id"] for m in matches])
+        prompt, packed = self.build_prompt_with_stats(query, matches, graph_facts)
         return {
-            "answer": answer,
-            "matches": [
-                {
-                    "id": m["id"],
-                    "score": m.get("score", 0),
-                    "metadata": m.get("metadata", {})
-                }
-                for m in matches
-            ],
-            "graph_facts": []  # Empty since we don't have Neo4j
+            "context": {
+                "matches": format_matches(matches),
+                "graph_facts": graph_facts,
+                "context_tokens": packed["tokens"]
+            },
+            "prompt": prompt,
+            "llm": self.llm  # built here, off the event loop
         }
 
+    def stream_query(self, query: str, filters=None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Process a query as a stream of (event, data) pairs.
+
+        Retrieval results are emitted first as a ``context`` event, followed
+        by ``token`` events as the answer is generated and a final ``done``.
+        """
+        plan = self.prepare_stream(query, filters)
+        yield "context", plan["context"]
+        for text in self.call_chat_stream(plan["prompt"]):
+            yield "token", {"text": text}
+        yield "done", {}
+
+    async def astream_query(self, query: str, filters=None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """stream_query() for the event loop: retrieval on the stream worker pool,
+        tokens from the provider's async stream."""
+        plan = await run_blocking_stream(self.prepare_stream, query, filters)
+        yield "context", plan["context"]
+        async for text in plan["llm"].astream(plan["prompt"]):
+            yield "token", {"text": text}
+        yield "done", {}
+
+    def _search_many(self, queries: List[str], top_k=TOP_K, mode=None, filters=None):
+        """search() for many queries with one encode call and concurrent Pinecone lookups."""
+        mode = (mode or RETRIEVAL_MODE).lower()
+        filters = normalize_filters(filters)
+        if mode == "lexical":
+            return [self.lexical_index.search(q, top_k, filters=filters) for q in queries]
+        vecs = [v.tolist() for v in self.embedder.encode(list(queries), normalize_embeddings=True)]
+        fetch = top_k * 2 if mode == "hybrid" else top_k
+        dense = PineconeVectorStore(self.index).query_many(vecs, fetch, filters=filters)
+        if mode == "hybrid":
+            return [
+                rrf_fuse([d, self.lexical_index.search(q, fetch, filters=filters)], top_k)
+                for q, d in zip(queries, dense)
+            ]
+        return dense
+
+    def search_batch(self, queries: List[str], top_k=TOP_K, mode=None, filters=None) -> List[Dict[str, Any]]:
+        return [{"matches": format_matches(m)} for m in self._search_many(queries, top_k, mode, filters)]
+
+    def process_batch(self, queries: List[str], filters=None) -> List[Dict[str, Any]]:
+        """process_query() for many queries; failed items carry an ``error``."""
+        all_matches = self._search_many(queries, TOP_K, filters=filters)
+        node_ids = list(dict.fromkeys(m["id"] for matches in all_matches for m in matches))
+        facts_by_source = defaultdict(list)
+        for f in self.fetch_graph_context(node_ids):
+            facts_by_source[f["source"]].append(f)
+
+        def answer(i):
+            matches = all_matches[i]
+            graph_facts = [f for m in matches for f in facts_by_source.get(m["id"], [])]
+            prompt, packed = self.build_prompt_with_stats(queries[i], matches, graph_facts)
+            return {
+                "answer": self.call_chat(prompt),
+                "matches": format_matches(matches),
+                "graph_facts": graph_facts,
+                "context_tokens": packed["tokens"]
+            }
+
+        results = []
+        with ThreadPoolExecutor(max_workers=max(1, min(BATCH_LLM_CONCURRENCY, len(queries)))) as pool:
+            futures = [pool.submit(answer, i) for i in range(len(queries))]
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append({"error": f"Error processing query: {e}"})
+        return results
+
     def get_graph_data(self, node_ids: List[str]) -> Dict[str, Any]:
-        """Return empty graph data since Neo4j is not available."""
-        return {"nodes": [], "edges": []}
+        """Get graph data for visualization from the in-process graph."""
+        return self.graph.subgraph(node_ids)
+
+    def graph_etag(self, node_ids: List[str]) -> str:
+        """ETag for get_graph_data(node_ids) under the loaded dataset version."""
+        return graph_etag(self.graph.version, node_ids)
+
+    def stats(self) -> Dict[str, Any]:
+        """Coalescing counters for monitoring (no caches in the fallback service)."""
+        if self.single_flight is None:
+            return {}
+        return {"single_flight": self.single_flight.stats()}
 
     def close(self):
-        """Close database connections."""
-        pass  # No Neo4j connection to close
+        """Close the chat provider's connections (no Neo4j connection here)."""
+        llm = self.__dict__.get("_llm")
+        if llm is not None:
+            llm.close()
+
+    async def aclose(self):
+        """Close the chat provider's async connections (call before close())."""
+        llm = self.__dict__.get("_llm")
+        if llm is not None:
+            await llm.aclose()
 
 # Global instance
 chat_service_fallback = ChatServiceFallback()
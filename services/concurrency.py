@@ -0,0 +1,33 @@
+# services/concurrency.py
+# Bounded executor that keeps the synchronous retrieval/LLM pipeline off the
+# asyncio event loop.
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import config
+
+API_WORKER_THREADS = getattr(config, "API_WORKER_THREADS", 16)
+STREAM_WORKER_THREADS = getattr(config, "STREAM_WORKER_THREADS", 16)
+
+_executor = ThreadPoolExecutor(max_workers=API_WORKER_THREADS, thread_name_prefix="chat-worker")
+# retrieval for streamed answers gets its own pool so a stream's first event
+# does not queue behind whole process_query runs
+_stream_executor = ThreadPoolExecutor(max_workers=STREAM_WORKER_THREADS, thread_name_prefix="stream-worker")
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking callable on the shared bounded pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def run_blocking_stream(fn, *args, **kwargs):
+    """run_blocking() on the stream pool (retrieval ahead of a streamed answer)."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_stream_executor, functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_executor(wait: bool = True) -> None:
+    _executor.shutdown(wait=wait)
+    _stream_executor.shutdown(wait=wait)
@@ -0,0 +1,91 @@
+# services/context_packer.py
+# Token-budgeted prompt context: de-duplicate graph facts, rank vector
+# snippets and facts by relevance and keep as many as fit the budget.
+
+import re
+from functools import lru_cache
+from typing import List, Dict, Any
+
+_WORDISH = re.compile(r"\w+|[^\w\s]")
+
+MAX_MATCHES = 10
+MAX_FACTS = 20
+# relevance of a graph fact = source match score * PROXIMITY_DECAY ** rank,
+# where rank is the fact's position among its source's neighbours (nearest first)
+PROXIMITY_DECAY = 0.85
+
+
+@lru_cache(maxsize=None)
+def _encoding():
+    """tiktoken's cl100k_base, or None. Loaded on first use rather than at
+    import, since a cold tiktoken cache downloads the BPE file."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count with tiktoken when installed, else a word/punctuation estimate."""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(_WORDISH.findall(text))
+
+
+def match_line(m) -> str:
+    meta = m["metadata"]
+    score = m.get("score", None)
+    snippet = f"- id: {m['id']}, name: {meta.get('name','')}, type: {meta.get('type','')}, score: {score}"
+    if meta.get("city"):
+        snippet += f", city: {meta.get('city')}"
+    return snippet
+
+
+def fact_line(f: Dict[str, Any]) -> str:
+    return f"- ({f['source']}) -[{f['rel']}]-> ({f['target_id']}) {f['target_name']}: {f['target_desc']}"
+
+
+def pack_context(matches, graph_facts: List[Dict[str, Any]], budget: int) -> Dict[str, Any]:
+    """Greedily fill `budget` tokens with the most relevant snippets.
+
+    Returns the selected ``match_lines`` and ``fact_lines`` (each in relevance
+    order), the ``tokens`` they use and how many candidates were ``dropped``.
+    """
+    scores = {m["id"]: float(m.get("score") or 0.0) for m in matches}
+
+    candidates = []
+    for m in matches[:MAX_MATCHES]:
+        candidates.append((scores[m["id"]], "match", match_line(m)))
+
+    # one fact per target: keep its most relevant occurrence
+    best_facts: Dict[str, tuple] = {}
+    rank: Dict[str, int] = {}
+    for f in graph_facts:
+        r = rank.get(f["source"], 0)
+        rank[f["source"]] = r + 1
+        relevance = scores.get(f["source"], 0.0) * PROXIMITY_DECAY ** r
+        current = best_facts.get(f["target_id"])
+        if current is None or relevance > current[0]:
+            best_facts[f["target_id"]] = (relevance, f)
+    for relevance, f in sorted(best_facts.values(), key=lambda x: -x[0])[:MAX_FACTS]:
+        candidates.append((relevance, "fact", fact_line(f)))
+
+    candidates.sort(key=lambda c: -c[0])
+    match_lines, fact_lines = [], []
+    used = 0
+    for _, kind, line in candidates:
+        cost = estimate_tokens(line) + 1  # + newline
+        if used + cost > budget:
+            continue
+        used += cost
+        (match_lines if kind == "match" else fact_lines).append(line)
+
+    return {
+        "match_lines": match_lines,
+        "fact_lines": fact_lines,
+        "tokens": used,
+        "dropped": len(candidates) - len(match_lines) - len(fact_lines),
+        "duplicates_removed": len(graph_facts) - len(best_facts)
+    }
@@ -0,0 +1,210 @@
+# services/embedders.py
+# Selectable embedding backends: PyTorch SentenceTransformer (default) or an
+# ONNX Runtime export of the same model, optionally int8-quantised, for
+# CPU-only serving.
+#
+#   python -m services.embedders export   # export (and quantise) to ONNX_MODEL_DIR
+#   python -m services.embedders parity   # cosine parity vs the PyTorch vectors
+#   python -m services.embedders bench    # load time / memory / latency per backend
+
+import json
+import os
+import sys
+import time
+from typing import List, Dict, Any
+
+import numpy as np
+import config
+
+EMBED_MODEL = "BAAI/bge-m3"
+EMBED_BACKEND = getattr(config, "EMBED_BACKEND", "torch").lower()
+ONNX_MODEL_DIR = getattr(config, "ONNX_MODEL_DIR", "data/onnx/bge-m3")
+ONNX_QUANTIZE = getattr(config, "ONNX_QUANTIZE", True)
+ONNX_THREADS = getattr(config, "ONNX_THREADS", 0)  # 0 = let ONNX Runtime decide
+ONNX_MAX_LENGTH = getattr(config, "ONNX_MAX_LENGTH", 8192)
+PARITY_THRESHOLD = getattr(config, "ONNX_PARITY_THRESHOLD", 0.99)
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+
+
+def load_embedder(backend: str = None, model: str = EMBED_MODEL):
+    """Return an object with a SentenceTransformer-compatible ``encode``."""
+    backend = (backend or EMBED_BACKEND).lower()
+    if backend == "onnx":
+        return OnnxEmbedder(ONNX_MODEL_DIR, quantized=ONNX_QUANTIZE, threads=ONNX_THREADS)
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model)
+
+
+class OnnxEmbedder:
+    """BGE-M3 dense embeddings (CLS pooling) under ONNX Runtime."""
+
+    def __init__(self, model_dir: str, quantized: bool = True, threads: int = 0, max_length: int = ONNX_MAX_LENGTH):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        path = os.path.join(model_dir, INT8_FILE if quantized else FP32_FILE)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found; run `python -m services.embedders export` first")
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_length = max_length
+
+    def encode(self, texts, batch_size: int = 32, normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        texts = list(texts)
+        out = [None] * len(texts)
+        # length-sorted batches keep padding (and wasted compute) small
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            enc = self.tokenizer(
+                [texts[i] for i in idx], padding=True, truncation=True,
+                max_length=self.max_length, return_tensors="np"
+            )
+            hidden = self.session.run(None, {
+                "input_ids": enc["input_ids"].astype(np.int64),
+                "attention_mask": enc["attention_mask"].astype(np.int64)
+            })[0]
+            cls = hidden[:, 0, :]
+            if normalize_embeddings:
+                cls = cls / np.linalg.norm(cls, axis=1, keepdims=True)
+            for i, vec in zip(idx, cls):
+                out[i] = vec
+        if not out:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack(out).astype(np.float32)
+
+
+def export_onnx(model: str = EMBED_MODEL, out_dir: str = ONNX_MODEL_DIR, quantize: bool = True, opset: int = 17) -> None:
+    """Export the transformer to ONNX and optionally write an int8 dynamic-quantised copy."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model)
+    hf_model = AutoModel.from_pretrained(model).eval()
+    tokenizer.save_pretrained(out_dir)
+
+    class LastHidden(torch.nn.Module):
+        def __init__(self, m):
+            super().__init__()
+            self.m = m
+
+        def forward(self, input_ids, attention_mask):
+            return self.m(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    fp32_path = os.path.join(out_dir, FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            LastHidden(hf_model),
+            (sample["input_ids"], sample["attention_mask"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "seq"},
+                "attention_mask": {0: "batch", 1: "seq"},
+                "last_hidden_state": {0: "batch", 1: "seq"}
+            },
+            opset_version=opset
+        )
+    print(f"Wrote {fp32_path}")
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        int8_path = os.path.join(out_dir, INT8_FILE)
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        print(f"Wrote {int8_path}")
+
+
+def _sample_texts(n: int = 64) -> List[str]:
+    with open("vietnam_travel_dataset.json", "r", encoding="utf-8") as f:
+        nodes = json.load(f)
+    return [node.get("semantic_text") or node.get("name", "") for node in nodes[:n]]
+
+
+def parity_check(threshold: float = PARITY_THRESHOLD, quantized: bool = ONNX_QUANTIZE) -> Dict[str, Any]:
+    """Compare ONNX vectors with the PyTorch reference; passes if every cosine >= threshold."""
+    texts = _sample_texts()
+    ref = load_embedder("torch").encode(texts, normalize_embeddings=True)
+    onnx_vecs = OnnxEmbedder(ONNX_MODEL_DIR, quantized=quantized, threads=ONNX_THREADS).encode(texts, normalize_embeddings=True)
+    cos = np.sum(np.asarray(ref) * onnx_vecs, axis=1)
+    return {
+        "texts": len(texts),
+        "min_cosine": float(cos.min()),
+        "mean_cosine": float(cos.mean()),
+        "threshold": threshold,
+        "passed": bool(cos.min() >= threshold)
+    }
+
+
+def _bench_backend(backend: str, quantized: bool, queries: int) -> Dict[str, Any]:
+    import resource
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if backend == "onnx":
+        embedder = OnnxEmbedder(ONNX_MODEL_DIR, quantized=quantized, threads=ONNX_THREADS)
+    else:
+        embedder = load_embedder("torch")
+    load_s = time.perf_counter() - start
+
+    texts = _sample_texts()
+    embedder.encode(texts[:2], normalize_embeddings=True)  # warm
+    single = []
+    for text in (texts * (queries // len(texts) + 1))[:queries]:
+        t = time.perf_counter()
+        embedder.encode([text], normalize_embeddings=True)
+        single.append((time.perf_counter() - t) * 1000)
+    t = time.perf_counter()
+    embedder.encode(texts, batch_size=32, normalize_embeddings=True)
+    batch_ms = (time.perf_counter() - t) * 1000
+
+    return {
+        "backend": backend + ("-int8" if backend == "onnx" and quantized else ""),
+        "load_s": round(load_s, 2),
+        "peak_rss_mb": round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024, 1),
+        "single_p50_ms": round(float(np.percentile(single, 50)), 2),
+        "single_p95_ms": round(float(np.percentile(single, 95)), 2),
+        "batch64_ms": round(batch_ms, 1)
+    }
+
+
+def benchmark(queries: int = 50) -> List[Dict[str, Any]]:
+    """Run each backend in a fresh process so load time and memory are not shared."""
+    import multiprocessing as mp
+
+    results = []
+    ctx = mp.get_context("spawn")
+    for backend, quantized in [("torch", False), ("onnx", False), ("onnx", True)]:
+        with ctx.Pool(1) as pool:
+            try:
+                results.append(pool.apply(_bench_backend, (backend, quantized, queries)))
+            except Exception as e:
+                results.append({"backend": backend, "quantized": quantized, "error": str(e)})
+    return results
+
+
+def main():
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "help"
+    if cmd == "export":
+        export_onnx(quantize=ONNX_QUANTIZE)
+    elif cmd == "parity":
+        result = parity_check()
+        print(json.dumps(result, indent=2))
+        sys.exit(0 if result["passed"] else 1)
+    elif cmd == "bench":
+        for row in benchmark():
+            print(json.dumps(row))
+    else:
+        print("usage: python -m services.embedders [export|parity|bench]")
+
+
+if __name__ == "__main__":
+    main()
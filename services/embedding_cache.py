@@ -0,0 +1,111 @@
+# services/embedding_cache.py
+# Two-tier cache for query embeddings: a bounded in-process LRU in front of
+# an optional SQLite file that survives restarts.
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Dict, Any
+
+import numpy as np
+
+
+def normalize_query(text: str) -> str:
+    """Cache key normalisation: case-fold and collapse whitespace."""
+    return " ".join(text.lower().split())
+
+
+class EmbeddingCache:
+    """LRU (tier 1) + optional on-disk SQLite store (tier 2) for embeddings.
+
+    Keys are ``model`` + normalised query text, so switching the embedding
+    model never serves stale vectors. The LRU and the SQLite connection have
+    separate locks, so in-memory hits never wait behind a disk read or write.
+    """
+
+    def __init__(self, model: str, max_entries: int = 1024, path: Optional[str] = None):
+        self.model = model
+        self.max_entries = max_entries
+        self.path = path
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()      # LRU and counters
+        self._db_lock = threading.Lock()   # SQLite connection
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            # WAL + NORMAL: commits append to the log without an fsync each time
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, query TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model, query))"
+            )
+            self._db.commit()
+
+    def get(self, text: str) -> Optional[List[float]]:
+        key = normalize_query(text)
+        with self._lock:
+            vec = self._lru.get(key)
+            if vec is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return vec
+
+        row = None
+        with self._db_lock:
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT vector FROM embeddings WHERE model = ? AND query = ?",
+                    (self.model, key)
+                ).fetchone()
+
+        with self._lock:
+            if row is not None:
+                vec = np.frombuffer(row[0], dtype=np.float32).tolist()
+                self._remember(key, vec)
+                self.disk_hits += 1
+                return vec
+            self.misses += 1
+            return None
+
+    def put(self, text: str, vec: List[float]) -> None:
+        key = normalize_query(text)
+        with self._lock:
+            self._remember(key, vec)
+        with self._db_lock:
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (model, query, vector) VALUES (?, ?, ?)",
+                    (self.model, key, np.asarray(vec, dtype=np.float32).tobytes())
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, vec: List[float]) -> None:
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "size": len(self._lru),
+                "max_entries": self.max_entries,
+                "persistent": self._db is not None
+            }
+
+    def close(self) -> None:
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,171 @@
+# services/embedding_server.py
+# Embedding sidecar: one process owns the BGE-M3 model and serves encode
+# requests to API workers over a Unix socket. Vectors are handed back through
+# a per-connection shared-memory buffer instead of being serialised.
+#
+# Run with:  python -m services.embedding_server [socket_path]
+
+import json
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+from multiprocessing import shared_memory
+from typing import List
+
+import numpy as np
+
+_HEADER = struct.Struct("!I")
+
+
+def _send_msg(sock: socket.socket, payload: dict) -> None:
+    data = json.dumps(payload).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("embedding server connection closed")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def _recv_msg(sock: socket.socket) -> dict:
+    (length,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, length).decode("utf-8"))
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to a segment owned by the server without adopting its lifetime."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        # Older Pythons register attached segments with the resource tracker,
+        # which would unlink the server's buffer when this process exits.
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class _EncodeHandler(socketserver.BaseRequestHandler):
+    def setup(self):
+        self.shm = None
+
+    def handle(self):
+        while True:
+            try:
+                req = _recv_msg(self.request)
+            except (ConnectionError, struct.error):
+                return
+            try:
+                vecs = self.server.encode(req["texts"], req.get("normalize", True))
+                shm = self._buffer(vecs.nbytes)
+                np.ndarray(vecs.shape, dtype=np.float32, buffer=shm.buf)[:] = vecs
+                _send_msg(self.request, {"shm": shm.name, "shape": list(vecs.shape)})
+            except Exception as e:
+                _send_msg(self.request, {"error": str(e)})
+
+    def _buffer(self, nbytes: int) -> shared_memory.SharedMemory:
+        # reuse the connection's segment; grow (doubling) when a batch outgrows it
+        if self.shm is None or self.shm.size < nbytes:
+            size = max(nbytes, 2 * (self.shm.size if self.shm else 0), 1 << 16)
+            self._release()
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        return self.shm
+
+    def _release(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def finish(self):
+        self._release()
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, embedder):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, _EncodeHandler)
+        self.embedder = embedder
+        self._model_lock = threading.Lock()
+
+    def encode(self, texts: List[str], normalize: bool) -> np.ndarray:
+        # an empty request still gets a (0, D) array like SentenceTransformer,
+        # so encode a placeholder to learn D
+        with self._model_lock:
+            vecs = self.embedder.encode(list(texts) or [""], normalize_embeddings=normalize)
+        vecs = np.ascontiguousarray(vecs, dtype=np.float32).reshape(max(len(texts), 1), -1)
+        return vecs[:len(texts)]
+
+
+class EmbeddingClient:
+    """Drop-in stand-in for SentenceTransformer.encode backed by the sidecar.
+
+    Each thread keeps its own connection (and therefore its own server-side
+    buffer), so concurrent callers never overwrite each other's vectors.
+    """
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self._local = threading.local()
+
+    def _conn(self):
+        local = self._local
+        if getattr(local, "sock", None) is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.socket_path)
+            local.sock = sock
+            local.shm = None
+        return local
+
+    def encode(self, texts, batch_size: int = 32, normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        local = self._conn()
+        try:
+            _send_msg(local.sock, {"texts": list(texts), "normalize": normalize_embeddings})
+            resp = _recv_msg(local.sock)
+        except (OSError, ConnectionError):
+            # drop the broken connection so the next call reconnects
+            local.sock.close()
+            local.sock = None
+            raise
+        if "error" in resp:
+            raise RuntimeError(f"embedding server error: {resp['error']}")
+
+        if local.shm is None or local.shm.name != resp["shm"]:
+            if local.shm is not None:
+                local.shm.close()
+            local.shm = _attach(resp["shm"])
+        view = np.ndarray(tuple(resp["shape"]), dtype=np.float32, buffer=local.shm.buf)
+        # the buffer is reused by the next request on this connection
+        return view.copy()
+
+
+def main():
+    import config
+    from services.embedders import load_embedder
+
+    socket_path = sys.argv[1] if len(sys.argv) > 1 else getattr(config, "EMBED_SERVER_SOCKET", None) or "/tmp/hybrid-chat-embed.sock"
+    model = getattr(config, "EMBED_MODEL", "BAAI/bge-m3")
+    print(f"Loading {model} ...")
+    server = EmbeddingServer(socket_path, load_embedder(model=model))
+    print(f"Embedding server listening on {socket_path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    main()
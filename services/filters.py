@@ -0,0 +1,87 @@
+# services/filters.py
+# Structured metadata filters (type / city / region / tags): translation to
+# Pinecone filter syntax and precomputed bitmaps for the local indexes.
+
+import json
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+# AND across fields, OR within a field; "tags" matches if any tag matches
+FILTER_FIELDS = ("type", "city", "region", "tags")
+
+
+def normalize_filters(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, List[str]]]:
+    """Drop empty fields and coerce scalars to lists; None when nothing is filtered."""
+    if not filters:
+        return None
+    out = {}
+    for field in FILTER_FIELDS:
+        values = filters.get(field)
+        if values is None:
+            continue
+        if isinstance(values, str):
+            values = [values]
+        values = [v for v in values if v]
+        if values:
+            out[field] = values
+    return out or None
+
+
+def filters_key(filters: Optional[Dict[str, Any]]) -> str:
+    """Canonical string for a filter set; equal for equivalent filters."""
+    filters = normalize_filters(filters) or {}
+    canonical = {field: sorted(map(str, values)) for field, values in filters.items()}
+    return json.dumps(canonical, sort_keys=True)
+
+
+def to_pinecone_filter(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    filters = normalize_filters(filters)
+    if not filters:
+        return None
+    return {field: {"$in": values} for field, values in filters.items()}
+
+
+class FilterBitmaps:
+    """Per-field, per-value packed bitmaps over a row-aligned metadata list.
+
+    Filtering is a handful of bitwise ORs/ANDs over precomputed bitmaps;
+    no per-document metadata is inspected at query time. Values match
+    exactly, like Pinecone's ``$in``, so every backend returns the same rows.
+    """
+
+    def __init__(self, metadata: List[Dict[str, Any]]):
+        self.size = len(metadata)
+        rows: Dict[str, Dict[str, List[int]]] = {field: {} for field in FILTER_FIELDS}
+        for i, meta in enumerate(metadata):
+            for field in FILTER_FIELDS:
+                values = meta.get(field)
+                if values is None:
+                    continue
+                for value in (values if isinstance(values, list) else [values]):
+                    if value:
+                        rows[field].setdefault(str(value), []).append(i)
+
+        self.bitmaps: Dict[str, Dict[str, np.ndarray]] = {}
+        for field, by_value in rows.items():
+            self.bitmaps[field] = {}
+            for value, idx in by_value.items():
+                bits = np.zeros(self.size, dtype=bool)
+                bits[idx] = True
+                self.bitmaps[field][value] = np.packbits(bits)
+        self._empty = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def mask(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Boolean row mask for `filters`, or None when nothing is filtered."""
+        filters = normalize_filters(filters)
+        if not filters:
+            return None
+        result = None
+        for field, values in filters.items():
+            field_bits = self._empty
+            for value in values:
+                bits = self.bitmaps[field].get(str(value))
+                if bits is not None:
+                    field_bits = field_bits | bits
+            result = field_bits if result is None else result & field_bits
+        return np.unpackbits(result, count=self.size).astype(bool)
@@ -0,0 +1,127 @@
+# services/graph_engine.py
+# Compact in-process graph built from the dataset's `connections` arrays.
+# Serves the same neighbour facts and subgraph views that ChatService gets
+# from Cypher, without a database round trip.
+
+import json
+from collections import deque
+from typing import List, Dict, Any
+
+import numpy as np
+
+from services.graph_meta import dataset_version
+
+
+class CSRGraph:
+    """Undirected adjacency in CSR form with interned relation types.
+
+    Neighbours of node ``i`` are ``indices[indptr[i]:indptr[i+1]]`` and the
+    relation type of each edge is ``rel_types[rels[k]]``. Like the Cypher
+    pattern ``(n)-[r]-(m)``, every relation is visible from both ends.
+    """
+
+    def __init__(self, nodes: List[Dict[str, Any]], version: str = None):
+        self.version = version
+        self.ids = [node["id"] for node in nodes]
+        self.index = {nid: i for i, nid in enumerate(self.ids)}
+        self.names = [node.get("name") for node in nodes]
+        self.types = [node.get("type") for node in nodes]
+        self.descriptions = [node.get("description") or "" for node in nodes]
+
+        self.rel_types: List[str] = []
+        rel_codes: Dict[str, int] = {}
+        edges = set()  # MERGE semantics: one edge per (source, type, target)
+        for node in nodes:
+            src = self.index[node["id"]]
+            for rel in node.get("connections", []):
+                tgt = self.index.get(rel.get("target"))
+                if tgt is None:
+                    continue
+                rel_type = rel.get("relation", "RELATED_TO")
+                code = rel_codes.setdefault(rel_type, len(rel_codes))
+                if code == len(self.rel_types):
+                    self.rel_types.append(rel_type)
+                edges.add((src, code, tgt))
+
+        edge_arr = np.array(sorted(edges), dtype=np.int32).reshape(-1, 3)
+        # both directions, ordered by source so each row is contiguous
+        src = np.concatenate([edge_arr[:, 0], edge_arr[:, 2]])
+        dst = np.concatenate([edge_arr[:, 2], edge_arr[:, 0]])
+        rel = np.concatenate([edge_arr[:, 1], edge_arr[:, 1]])
+        order = np.argsort(src, kind="stable")
+        self.indices = dst[order]
+        self.rels = rel[order].astype(np.int16)
+        self.indptr = np.zeros(len(self.ids) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(src, minlength=len(self.ids)), out=self.indptr[1:])
+
+    @classmethod
+    def from_file(cls, path: str) -> "CSRGraph":
+        with open(path, "r", encoding="utf-8") as f:
+            nodes = json.load(f)
+        return cls(nodes, version=dataset_version(path))
+
+    def labels(self, i: int) -> List[str]:
+        return [self.types[i], "Entity"]
+
+    def neighbours(self, i: int):
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return zip(self.indices[start:end].tolist(), self.rels[start:end].tolist())
+
+    def neighbour_facts(self, node_ids: List[str], depth: int = 1, limit: int = 10) -> List[Dict[str, Any]]:
+        """Up to `limit` nearest neighbours within `depth` hops of each id, as fact dicts."""
+        facts = []
+        for nid in node_ids:
+            src = self.index.get(nid)
+            if src is None:
+                continue
+            # BFS: targets come out in order of hop distance, each once,
+            # labelled with the relation on the last hop of its shortest path
+            seen = {src}
+            frontier = deque([(src, 0)])
+            found = 0
+            while frontier and found < limit:
+                cur, hops = frontier.popleft()
+                if hops == depth:
+                    continue
+                for tgt, code in self.neighbours(cur):
+                    if tgt in seen:
+                        continue
+                    seen.add(tgt)
+                    facts.append(self._fact(nid, code, tgt))
+                    found += 1
+                    if found == limit:
+                        break
+                    frontier.append((tgt, hops + 1))
+        return facts
+
+    def _fact(self, source: str, code: int, tgt: int) -> Dict[str, Any]:
+        return {
+            "source": source,
+            "rel": self.rel_types[code],
+            "target_id": self.ids[tgt],
+            "target_name": self.names[tgt],
+            "target_desc": self.descriptions[tgt][:400],
+            "labels": self.labels(tgt)
+        }
+
+    def subgraph(self, node_ids: List[str]) -> Dict[str, Any]:
+        """Nodes for `node_ids` and the edges among them, in the visualization format."""
+        members = {self.index[nid] for nid in node_ids if nid in self.index}
+        nodes = []
+        edges = []
+        for i in sorted(members):
+            nodes.append({
+                "id": self.ids[i],
+                "label": self.names[i],
+                "group": self.types[i],
+                "title": f"{self.names[i]} ({', '.join(self.labels(i))})"
+            })
+            for tgt, code in self.neighbours(i):
+                if tgt in members:
+                    edges.append({
+                        "from": self.ids[i],
+                        "to": self.ids[tgt],
+                        "label": self.rel_types[code],
+                        "arrows": "to"
+                    })
+        return {"nodes": nodes, "edges": edges}
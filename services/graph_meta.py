@@ -0,0 +1,32 @@
+# services/graph_meta.py
+# Graph load version stamp, written by load_to_neo4j.py and read by the API
+# to build cache validators.
+
+import hashlib
+from typing import List
+
+# Single metadata node holding the version of the last catalog load
+READ_VERSION_QUERY = "MATCH (m:GraphMeta {key: 'catalog'}) RETURN m.version AS version"
+WRITE_VERSION_QUERY = (
+    "MERGE (m:GraphMeta {key: 'catalog'}) "
+    "SET m.version = $version, m.loaded_at = datetime()"
+)
+UNVERSIONED = "unversioned"
+
+
+def dataset_version(path: str) -> str:
+    """Content hash of the dataset file; identical reloads keep the same version."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def graph_etag(version: str, node_ids: List[str]) -> str:
+    """Strong ETag for a subgraph: graph version + sorted, de-duplicated id set."""
+    h = hashlib.sha256(version.encode("utf-8"))
+    for nid in sorted(set(node_ids)):
+        h.update(b"\0")
+        h.update(nid.encode("utf-8"))
+    return f'"{h.hexdigest()[:32]}"'
@@ -0,0 +1,66 @@
+# services/lazy.py
+# On-first-use construction of heavy service components, plus per-component
+# readiness tracking for warmup and the /api/ready probe.
+
+import threading
+import time
+from typing import Any, Callable, Dict
+
+
+class LazyComponents:
+    """Mixin: build expensive clients lazily and record their warmup status."""
+
+    def _init_components(self, names, optional=()):
+        """Track readiness for `names`; components in `optional` are reported
+        but do not hold back overall readiness (e.g. built only on demand)."""
+        self._components_lock = threading.RLock()
+        self._readiness: Dict[str, Dict[str, Any]] = {
+            name: {"ready": False, "error": None, "seconds": None} for name in names
+        }
+        self._optional_components = set(optional)
+
+    def _lazy(self, attr: str, factory: Callable[[], Any], component: str = None) -> Any:
+        """Return self.<attr>, building it once (thread-safely) on first access.
+
+        A successful build marks ``component`` (default: attr without the
+        leading underscore, if tracked) ready, so services that skip warmup
+        still become ready once requests have built their components.
+        """
+        value = self.__dict__.get(attr)
+        if value is None:
+            with self._components_lock:
+                value = self.__dict__.get(attr)
+                if value is None:
+                    start = time.perf_counter()
+                    value = factory()
+                    self.__dict__[attr] = value
+                    name = component or attr.lstrip("_")
+                    if name in self._readiness:
+                        self._readiness[name] = {
+                            "ready": True, "error": None, "seconds": round(time.perf_counter() - start, 3)
+                        }
+        return value
+
+    def _warm(self, name: str, fn: Callable[[], Any]) -> Any:
+        """Run one warmup step, recording readiness; errors are kept, not raised."""
+        start = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:
+            self._readiness[name] = {
+                "ready": False, "error": str(e), "seconds": round(time.perf_counter() - start, 3)
+            }
+            return None
+        self._readiness[name] = {
+            "ready": True, "error": None, "seconds": round(time.perf_counter() - start, 3)
+        }
+        return result
+
+    def readiness(self) -> Dict[str, Any]:
+        components = {name: dict(state) for name, state in self._readiness.items()}
+        return {
+            "ready": all(
+                state["ready"] for name, state in components.items() if name not in self._optional_components
+            ),
+            "components": components
+        }
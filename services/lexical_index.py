@@ -0,0 +1,113 @@
+# services/lexical_index.py
+# In-process BM25 inverted index over the dataset, plus reciprocal rank
+# fusion with dense (vector) results for hybrid retrieval.
+
+import json
+import re
+from collections import Counter, defaultdict
+from typing import List, Dict, Any
+
+import numpy as np
+
+from services.filters import FilterBitmaps
+from services.vector_store import city_regions, node_metadata
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is it its of on or the to with "
+    "what where when which who how best good top most do does i me my we our you your".split()
+)
+# name/tag hits matter more than body text: fields are repeated this many times
+FIELD_WEIGHTS = {"name": 3, "tags": 2, "semantic_text": 1, "description": 1}
+RRF_K = 60
+RETRIEVAL_MODES = ("dense", "lexical", "hybrid")
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 with postings stored as parallel (doc id, term freq) arrays."""
+
+    def __init__(self, nodes: List[Dict[str, Any]], k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = [node["id"] for node in nodes]
+        regions = city_regions(nodes)
+        self.metadata = [node_metadata(node, regions) for node in nodes]
+        self.bitmaps = FilterBitmaps(self.metadata)
+
+        postings = defaultdict(lambda: ([], []))
+        lengths = []
+        for doc, node in enumerate(nodes):
+            counts = Counter()
+            for field, weight in FIELD_WEIGHTS.items():
+                value = node.get(field) or ""
+                if isinstance(value, list):
+                    value = " ".join(value)
+                for tok in tokenize(value):
+                    counts[tok] += weight
+            lengths.append(sum(counts.values()))
+            for tok, tf in counts.items():
+                docs, tfs = postings[tok]
+                docs.append(doc)
+                tfs.append(tf)
+
+        self.doc_len = np.asarray(lengths, dtype=np.float32)
+        self.avg_len = float(self.doc_len.mean()) if len(lengths) else 0.0
+        n = len(self.ids)
+        self.postings = {}
+        self.idf = {}
+        for tok, (docs, tfs) in postings.items():
+            self.postings[tok] = (np.asarray(docs, dtype=np.int32), np.asarray(tfs, dtype=np.float32))
+            df = len(docs)
+            self.idf[tok] = float(np.log(1 + (n - df + 0.5) / (df + 0.5)))
+        # per-document length normalisation term, precomputed once
+        self._norm = self.k1 * (1 - self.b + self.b * self.doc_len / max(self.avg_len, 1e-9))
+
+    @classmethod
+    def from_file(cls, path: str) -> "BM25Index":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query: str, top_k: int, filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for tok in set(tokenize(query)):
+            posting = self.postings.get(tok)
+            if posting is None:
+                continue
+            docs, tfs = posting
+            scores[docs] += self.idf[tok] * tfs * (self.k1 + 1) / (tfs + self._norm[docs])
+        mask = self.bitmaps.mask(filters)
+        if mask is not None:
+            scores[~mask] = 0.0
+
+        hits = np.flatnonzero(scores)
+        if hits.size == 0 or top_k < 1:
+            return []
+        k = min(top_k, hits.size)
+        top = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {"id": self.ids[i], "score": float(scores[i]), "metadata": self.metadata[i]}
+            for i in top
+        ]
+
+
+def rrf_fuse(result_lists: List[List[Dict[str, Any]]], top_k: int, k: int = RRF_K) -> List[Dict[str, Any]]:
+    """Reciprocal rank fusion: score(d) = sum over lists of 1 / (k + rank)."""
+    fused: Dict[str, float] = defaultdict(float)
+    first_seen: Dict[str, Dict[str, Any]] = {}
+    for results in result_lists:
+        for rank, m in enumerate(results, start=1):
+            fused[m["id"]] += 1.0 / (k + rank)
+            first_seen.setdefault(m["id"], m)
+    ranked = sorted(fused.items(), key=lambda x: -x[1])[:top_k]
+    return [
+        {"id": mid, "score": score, "metadata": first_seen[mid].get("metadata", {})}
+        for mid, score in ranked
+    ]
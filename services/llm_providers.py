@@ -0,0 +1,320 @@
+# services/llm_providers.py
+# Chat LLM providers behind one interface: OpenAI, Google Gemini and a local
+# fake. Each provider builds its SDK client once and reuses it, so requests
+# ride on pooled keep-alive connections instead of paying connection setup
+# and a TLS handshake per call, and every call is bounded by connect/read
+# timeouts.
+#
+#   provider = load_provider()               # CHAT_PROVIDER from config
+#   provider.complete(messages)              # -> str
+#   provider.stream(messages)                # -> Iterator[str]
+#   await provider.acomplete(messages)       # -> str
+#   async for text in provider.astream(messages): ...
+#   await provider.aclose()                  # on the loop that made async calls
+
+import asyncio
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Iterator, AsyncIterator
+
+import config
+
+Messages = List[Dict[str, str]]
+
+CHAT_PROVIDER = getattr(config, "CHAT_PROVIDER", "openai").lower()
+DEFAULT_MODELS = {"openai": "gpt-4o-mini", "google": "gemini-2.5-flash", "fake": "fake"}
+CHAT_MODEL = getattr(config, "CHAT_MODEL", None) or DEFAULT_MODELS.get(CHAT_PROVIDER, "gpt-4o-mini")
+MAX_TOKENS = 600
+TEMPERATURE = 0.2
+LLM_CONNECT_TIMEOUT = getattr(config, "LLM_CONNECT_TIMEOUT", 5.0)
+LLM_READ_TIMEOUT = getattr(config, "LLM_READ_TIMEOUT", 60.0)
+LLM_MAX_RETRIES = getattr(config, "LLM_MAX_RETRIES", 2)
+LLM_MAX_CONNECTIONS = getattr(config, "LLM_MAX_CONNECTIONS", 32)
+LLM_KEEPALIVE_EXPIRY = getattr(config, "LLM_KEEPALIVE_EXPIRY", 60.0)
+
+
+def _sleep_ms(ms: float) -> None:
+    if ms > 0:
+        time.sleep(ms / 1000.0)
+
+
+def gemini_prompt_text(prompt_messages: Messages) -> str:
+    """Convert messages into a single text prompt; keep roles for clarity."""
+    joined = []
+    for m in prompt_messages:
+        role = m.get("role", "user")
+        content = m.get("content", "")
+        joined.append(f"{role.upper()}: {content}")
+    return "\n\n".join(joined)
+
+
+def load_provider(name: str = None, model: str = None) -> "ChatProvider":
+    """Build the provider selected by ``name`` (default CHAT_PROVIDER / CHAT_MODEL)."""
+    if name is None:
+        name, model = CHAT_PROVIDER, model or CHAT_MODEL
+    name = name.lower()
+    if name == "google":
+        return GeminiProvider(model or DEFAULT_MODELS["google"])
+    if name == "fake":
+        return FakeProvider()
+    if name == "openai":
+        return OpenAIProvider(model or DEFAULT_MODELS["openai"])
+    raise ValueError(f"Unknown CHAT_PROVIDER: {name!r} (expected 'openai', 'google' or 'fake')")
+
+
+class ChatProvider(ABC):
+    """Uniform chat interface; subclasses implement the four call styles."""
+
+    name = "base"
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @abstractmethod
+    def complete(self, messages: Messages) -> str:
+        ...
+
+    @abstractmethod
+    def stream(self, messages: Messages) -> Iterator[str]:
+        ...
+
+    @abstractmethod
+    async def acomplete(self, messages: Messages) -> str:
+        ...
+
+    @abstractmethod
+    def astream(self, messages: Messages) -> AsyncIterator[str]:
+        """Async generator of answer text chunks."""
+
+    def connect(self) -> None:
+        """Open a pooled connection ahead of the first request (best effort)."""
+
+    def close(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        """Release async resources; await it on the loop that made the async calls."""
+
+
+# -----------------------------
+# OpenAI
+# -----------------------------
+class OpenAIProvider(ChatProvider):
+    """OpenAI chat completions over shared httpx connection pools.
+
+    The sync and async clients each own one pool; httpx's read timeout is
+    per chunk, so long streams are fine as long as tokens keep arriving.
+    """
+
+    name = "openai"
+
+    def __init__(self, model: str = DEFAULT_MODELS["openai"], api_key: str = None,
+                 connect_timeout: float = LLM_CONNECT_TIMEOUT, read_timeout: float = LLM_READ_TIMEOUT,
+                 max_retries: int = LLM_MAX_RETRIES, max_connections: int = LLM_MAX_CONNECTIONS):
+        super().__init__(model)
+        import httpx
+        from openai import OpenAI
+
+        self._api_key = api_key or config.OPENAI_API_KEY
+        self._max_retries = max_retries
+        self._timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+        )
+        self.client = OpenAI(
+            api_key=self._api_key,
+            timeout=self._timeout,
+            max_retries=max_retries,
+            http_client=httpx.Client(timeout=self._timeout, limits=self._limits)
+        )
+        self._aclient = None
+        self._aclient_lock = threading.Lock()
+
+    @property
+    def aclient(self):
+        """AsyncOpenAI client, built on first async call (its pool binds to that event loop)."""
+        if self._aclient is None:
+            with self._aclient_lock:
+                if self._aclient is None:
+                    import httpx
+                    from openai import AsyncOpenAI
+                    self._aclient = AsyncOpenAI(
+                        api_key=self._api_key,
+                        timeout=self._timeout,
+                        max_retries=self._max_retries,
+                        http_client=httpx.AsyncClient(timeout=self._timeout, limits=self._limits)
+                    )
+        return self._aclient
+
+    def _params(self, messages: Messages, stream: bool = False) -> Dict[str, Any]:
+        params = {"model": self.model, "messages": messages, "max_tokens": MAX_TOKENS, "temperature": TEMPERATURE}
+        if stream:
+            params["stream"] = True
+        return params
+
+    def complete(self, messages: Messages) -> str:
+        resp = self.client.chat.completions.create(**self._params(messages))
+        return resp.choices[0].message.content
+
+    def stream(self, messages: Messages) -> Iterator[str]:
+        for chunk in self.client.chat.completions.create(**self._params(messages, stream=True)):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def acomplete(self, messages: Messages) -> str:
+        resp = await self.aclient.chat.completions.create(**self._params(messages))
+        return resp.choices[0].message.content
+
+    async def astream(self, messages: Messages) -> AsyncIterator[str]:
+        stream = await self.aclient.chat.completions.create(**self._params(messages, stream=True))
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def connect(self) -> None:
+        # cheap authenticated request; leaves a warm TLS connection in the pool
+        try:
+            self.client.with_options(max_retries=0).models.retrieve(self.model)
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        self.client.close()
+        aclient, self._aclient = self._aclient, None
+        if aclient is not None:
+            # the async pool belongs to an event loop: close it there if one
+            # is running, otherwise on a short-lived loop of our own
+            try:
+                asyncio.get_running_loop().create_task(aclient.close())
+            except RuntimeError:
+                asyncio.run(aclient.close())
+
+    async def aclose(self) -> None:
+        aclient, self._aclient = self._aclient, None
+        if aclient is not None:
+            await aclient.close()
+
+
+# -----------------------------
+# Google Gemini
+# -----------------------------
+class GeminiProvider(ChatProvider):
+    """google-generativeai with one configured client and one model object.
+
+    The SDK keeps a single gRPC channel per process; the per-call deadline
+    goes through ``request_options`` (gRPC has no separate connect timeout,
+    so LLM_CONNECT_TIMEOUT is not applied here).
+    """
+
+    name = "google"
+
+    def __init__(self, model: str = DEFAULT_MODELS["google"], api_key: str = None,
+                 read_timeout: float = LLM_READ_TIMEOUT):
+        super().__init__(model)
+        try:
+            import google.generativeai as genai
+        except Exception:
+            raise ImportError("google-generativeai is not installed. Please install it from requirements.txt")
+        api_key = api_key or getattr(config, "GOOGLE_API_KEY", None)
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY is not set in config.py but CHAT_PROVIDER is 'google'.")
+        genai.configure(api_key=api_key)
+        self.genai = genai
+        self.client = genai.GenerativeModel(model)
+        self._request_options = {"timeout": read_timeout}
+
+    @staticmethod
+    def _text(resp) -> str:
+        text = getattr(resp, "text", "")
+        if text:
+            return text
+        candidates = getattr(resp, "candidates", None) or [{}]
+        return candidates[0].get("content", {}).get("parts", [{}])[0].get("text", "")
+
+    def complete(self, messages: Messages) -> str:
+        resp = self.client.generate_content(gemini_prompt_text(messages), request_options=self._request_options)
+        return self._text(resp)
+
+    def stream(self, messages: Messages) -> Iterator[str]:
+        resp = self.client.generate_content(
+            gemini_prompt_text(messages), stream=True, request_options=self._request_options
+        )
+        for chunk in resp:
+            text = getattr(chunk, "text", "")
+            if text:
+                yield text
+
+    async def acomplete(self, messages: Messages) -> str:
+        resp = await self.client.generate_content_async(
+            gemini_prompt_text(messages), request_options=self._request_options
+        )
+        return self._text(resp)
+
+    async def astream(self, messages: Messages) -> AsyncIterator[str]:
+        resp = await self.client.generate_content_async(
+            gemini_prompt_text(messages), stream=True, request_options=self._request_options
+        )
+        async for chunk in resp:
+            text = getattr(chunk, "text", "")
+            if text:
+                yield text
+
+    def connect(self) -> None:
+        try:
+            self.genai.get_model(f"models/{self.model}", request_options=self._request_options)
+        except Exception:
+            pass
+
+
+# -----------------------------
+# Fake (tests, benchmarks, offline demos)
+# -----------------------------
+class FakeProvider(ChatProvider):
+    """Canned answer after ``latency_ms`` (time to first token) plus
+    ``per_token_ms`` per word; no network, no API key."""
+
+    name = "fake"
+
+    def __init__(self, latency_ms: float = 0.0, per_token_ms: float = 0.0, answer_words: int = 80,
+                 answer: str = None):
+        super().__init__(DEFAULT_MODELS["fake"])
+        self.latency_ms = latency_ms
+        self.per_token_ms = per_token_ms
+        self.answer = answer or " ".join(["lorem"] * answer_words)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _tokens(self) -> List[str]:
+        words = self.answer.split(" ")
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+    def _count(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def complete(self, messages: Messages) -> str:
+        self._count()
+        _sleep_ms(self.latency_ms + self.per_token_ms * len(self._tokens()))
+        return self.answer
+
+    def stream(self, messages: Messages) -> Iterator[str]:
+        self._count()
+        _sleep_ms(self.latency_ms)
+        for tok in self._tokens():
+            _sleep_ms(self.per_token_ms)
+            yield tok
+
+    async def acomplete(self, messages: Messages) -> str:
+        self._count()
+        await asyncio.sleep((self.latency_ms + self.per_token_ms * len(self._tokens())) / 1000.0)
+        return self.answer
+
+    async def astream(self, messages: Messages) -> AsyncIterator[str]:
+        self._count()
+        await asyncio.sleep(self.latency_ms / 1000.0)
+        for tok in self._tokens():
+            await asyncio.sleep(self.per_token_ms / 1000.0)
+            yield tok
@@ -0,0 +1,56 @@
+# services/manifest.py
+# Per-node content-hash manifests so pinecone_upload.py and load_to_neo4j.py
+# only touch what changed since their last successful run.
+
+import hashlib
+import json
+import os
+from typing import Dict, Any, List, Tuple
+
+MANIFEST_DIR = ".manifests"
+
+
+def content_hash(value: Any) -> str:
+    """Stable hash of any JSON-serialisable value."""
+    blob = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def node_connections(node: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """(relation, target) pairs of a node, de-duplicated and sorted."""
+    pairs = {
+        (rel.get("relation", "RELATED_TO"), rel["target"])
+        for rel in node.get("connections", [])
+        if rel.get("target")
+    }
+    return sorted(pairs)
+
+
+def load_manifest(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(path: str, manifest: Dict[str, Any]) -> None:
+    """Write atomically so an interrupted run never leaves a truncated manifest."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def diff_hashes(current: Dict[str, str], previous: Dict[str, str]) -> Tuple[List[str], List[str]]:
+    """Return (new or changed ids, removed ids)."""
+    changed = [nid for nid, h in current.items() if previous.get(nid) != h]
+    removed = [nid for nid in previous if nid not in current]
+    return changed, removed
+
+
+def diff_connections(current: Dict[str, List], previous: Dict[str, List]):
+    """Return (added, removed) lists of (source, relation, target) triples."""
+    cur = {(src, rel, tgt) for src, pairs in current.items() for rel, tgt in pairs}
+    prev = {(src, rel, tgt) for src, pairs in previous.items() for rel, tgt in pairs}
+    return sorted(cur - prev), sorted(prev - cur)
@@ -0,0 +1,177 @@
+# services/metrics.py
+# Per-stage latency instrumentation for the query pipeline, rendered in the
+# Prometheus text exposition format for the /metrics endpoint.
+#
+#   with stage("embed"):
+#       vec = self.embed_text(query)
+#
+# When METRICS_ENABLED is False and no per-request breakdown is being
+# collected, stage() returns a shared no-op context manager.
+
+import threading
+import time
+from contextvars import ContextVar
+from contextlib import nullcontext
+from typing import Dict, Any, Optional, Tuple
+
+import config
+
+METRICS_ENABLED = getattr(config, "METRICS_ENABLED", True)
+NAMESPACE = "hybrid_chat"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+GAUGE_HELP = {
+    "prompt_chars": "Characters in the most recent LLM prompt.",
+    "prompt_context_tokens": "Context tokens packed into the most recent LLM prompt.",
+    "response_chars": "Characters in the most recent LLM response."
+}
+
+_NOOP = nullcontext()
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+def _num(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class MetricsRegistry:
+    """Thread-safe stage histograms, error counters and size gauges."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._hist: Dict[str, Dict[str, Any]] = {}
+        self._errors: Dict[str, int] = {}
+        self._gauges: Dict[str, float] = {}
+
+    def observe(self, stage_name: str, seconds: float) -> None:
+        with self._lock:
+            h = self._hist.get(stage_name)
+            if h is None:
+                h = self._hist[stage_name] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    h["counts"][i] += 1
+                    break
+            h["sum"] += seconds
+            h["count"] += 1
+
+    def error(self, stage_name: str) -> None:
+        with self._lock:
+            self._errors[stage_name] = self._errors.get(stage_name, 0) + 1
+
+    def set_gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self._gauges[name] = float(value)
+
+    def render(self) -> str:
+        """Prometheus text exposition (version 0.0.4)."""
+        with self._lock:
+            hist = {k: {"counts": list(v["counts"]), "sum": v["sum"], "count": v["count"]} for k, v in self._hist.items()}
+            errors = dict(self._errors)
+            gauges = dict(self._gauges)
+
+        name = f"{NAMESPACE}_stage_seconds"
+        lines = [f"# HELP {name} Latency of each query pipeline stage.", f"# TYPE {name} histogram"]
+        for stage_name in sorted(hist):
+            h = hist[stage_name]
+            cumulative = 0
+            for bound, count in zip(self.buckets, h["counts"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(stage=stage_name, le=_num(bound))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(stage=stage_name, le='+Inf')} {h['count']}")
+            lines.append(f"{name}_sum{_labels(stage=stage_name)} {h['sum']}")
+            lines.append(f"{name}_count{_labels(stage=stage_name)} {h['count']}")
+
+        name = f"{NAMESPACE}_stage_errors_total"
+        lines += [f"# HELP {name} Exceptions raised by each query pipeline stage.", f"# TYPE {name} counter"]
+        for stage_name in sorted(errors):
+            lines.append(f"{name}{_labels(stage=stage_name)} {errors[stage_name]}")
+
+        for gauge in sorted(gauges):
+            name = f"{NAMESPACE}_{gauge}"
+            lines += [f"# HELP {name} {GAUGE_HELP.get(gauge, gauge)}", f"# TYPE {name} gauge"]
+            lines.append(f"{name} {_num(gauges[gauge])}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class _Stage:
+    __slots__ = ("name", "timings", "start")
+
+    def __init__(self, name: str, timings: Optional[Dict[str, float]]):
+        self.name = name
+        self.timings = timings
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        if METRICS_ENABLED:
+            registry.observe(self.name, elapsed)
+            if exc_type is not None:
+                registry.error(self.name)
+        if self.timings is not None:
+            self.timings[self.name] = round(self.timings.get(self.name, 0.0) + elapsed * 1000, 3)
+        return False
+
+
+def stage(name: str):
+    """Context manager timing one pipeline stage (no-op when nothing records it)."""
+    timings = _timings.get()
+    if not METRICS_ENABLED and timings is None:
+        return _NOOP
+    return _Stage(name, timings)
+
+
+def set_gauge(name: str, value: float) -> None:
+    if METRICS_ENABLED:
+        registry.set_gauge(name, value)
+
+
+def record_exchange(prompt_messages, context_tokens: int, answer: str) -> None:
+    """Prompt/response size gauges for the latest LLM call."""
+    if METRICS_ENABLED:
+        registry.set_gauge("prompt_chars", sum(len(m.get("content", "")) for m in prompt_messages))
+        registry.set_gauge("prompt_context_tokens", context_tokens)
+        registry.set_gauge("response_chars", len(answer or ""))
+
+
+def with_timings(fn, *args, **kwargs) -> Tuple[Any, Dict[str, float]]:
+    """Call ``fn`` and return ``(result, {stage: milliseconds})`` for its stages.
+
+    Must run on the thread doing the work (e.g. inside run_blocking), since
+    the breakdown is collected through a context variable.
+    """
+    timings: Dict[str, float] = {}
+    token = _timings.set(timings)
+    try:
+        return fn(*args, **kwargs), timings
+    finally:
+        _timings.reset(token)
+
+
+def add_timings(timings: Dict[str, float]) -> None:
+    """Fold stage timings measured on another call (e.g. a coalesced leader)
+    into the current with_timings() breakdown, if one is being collected."""
+    current = _timings.get()
+    if current is not None:
+        for name, ms in timings.items():
+            current[name] = round(current.get(name, 0.0) + ms, 3)
+
+
+def render() -> str:
+    return registry.render()
@@ -0,0 +1,114 @@
+# services/micro_batcher.py
+# Dynamic micro-batching: concurrent single-text encode requests that pile up
+# while the embedder is busy are run through it together in the next batch.
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Any, List
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """Coalesce concurrent ``encode(text)`` calls into batched ``encode_fn(texts)``.
+
+    A lone text is encoded immediately. Texts that arrive while a batch is
+    encoding queue up and form the next batch; when more than one is
+    already waiting, the worker lingers up to ``max_wait_ms`` for more (up
+    to ``max_batch``). A single worker thread owns the embedder, so the
+    model is never entered concurrently.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], Any], max_batch: int = 32, max_wait_ms: float = 5.0):
+        self.encode_fn = encode_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.batches = 0
+        self.items = 0
+        self.max_seen = 0
+
+    def submit(self, text: str) -> Future:
+        future: Future = Future()
+        self._ensure_worker()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str):
+        """Blocking helper: the vector for one text, computed in a shared batch."""
+        return self.submit(text).result()
+
+    def _ensure_worker(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = None
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    # nothing else pending: don't make a lone request wait;
+                    # under concurrency, linger briefly to fill the batch
+                    if len(batch) == 1:
+                        break
+                    if deadline is None:
+                        deadline = time.monotonic() + self.max_wait
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+            if stop:
+                return
+
+    def _flush(self, batch):
+        texts = [text for text, _ in batch]
+        try:
+            vectors = self.encode_fn(texts)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        with self._lock:
+            self.batches += 1
+            self.items += len(batch)
+            self.max_seen = max(self.max_seen, len(batch))
+        for (_, future), vec in zip(batch, vectors):
+            future.set_result(vec)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "max_batch_size": self.max_seen,
+                "pending": self._queue.qsize()
+            }
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,75 @@
+# services/neighbor_cache.py
+# Per-node neighbourhood cache for graph facts: the catalog graph only changes
+# when load_to_neo4j.py runs, so a node's neighbour facts stay valid until the
+# version stamp it writes changes.
+
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+
+class NeighborCache:
+    """Bounded LRU of neighbour facts keyed by (node id, depth).
+
+    Every entry belongs to one graph version; a lookup or store under a
+    different version drops the whole cache first, so facts from an older
+    load are never served. Nodes with no neighbours are cached as empty
+    lists.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self.version = None
+        self._entries: "OrderedDict[Tuple[str, int], List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_many(self, node_ids: Iterable[str], depth: int, version: str) -> Tuple[Dict[str, List[Dict[str, Any]]], List[str]]:
+        """Cached facts per node id, plus the de-duplicated ids that missed."""
+        found: Dict[str, List[Dict[str, Any]]] = {}
+        missing: List[str] = []
+        with self._lock:
+            self._check_version(version)
+            for nid in dict.fromkeys(node_ids):
+                facts = self._entries.get((nid, depth))
+                if facts is None:
+                    missing.append(nid)
+                    self.misses += 1
+                else:
+                    self._entries.move_to_end((nid, depth))
+                    found[nid] = facts
+                    self.hits += 1
+        return found, missing
+
+    def put_many(self, facts_by_node: Dict[str, List[Dict[str, Any]]], depth: int, version: str) -> None:
+        with self._lock:
+            self._check_version(version)
+            for nid, facts in facts_by_node.items():
+                self._entries[(nid, depth)] = facts
+                self._entries.move_to_end((nid, depth))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "version": self.version,
+                "invalidations": self.invalidations
+            }
+
+    def _check_version(self, version: Optional[str]) -> None:
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.version = version
@@ -0,0 +1,77 @@
+# services/single_flight.py
+# Request coalescing: concurrent calls with the same key share one in-flight
+# computation. Nothing is kept once it finishes, so results are never stale;
+# this only collapses bursts of identical questions into one pipeline run.
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+from services.embedding_cache import normalize_query
+from services.filters import filters_key
+
+
+def query_key(query: str, filters=None) -> str:
+    """Coalescing key: normalised query text plus canonicalised filters."""
+    return normalize_query(query) + "\x00" + filters_key(filters)
+
+
+class SingleFlight:
+    """Run ``fn`` once per key among concurrent callers.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is running wait for the leader's result or exception.
+    The key is released when the leader finishes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is None:
+                future = Future()
+                self._calls[key] = future
+                self._waiters[key] = 0
+                self.leaders += 1
+                leader = True
+            else:
+                self._waiters[key] += 1
+                self.coalesced += 1
+                self.max_waiters = max(self.max_waiters, self._waiters[key])
+                leader = False
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._release(key)
+            future.set_exception(e)
+            raise
+        # release first so a caller arriving now starts a fresh run
+        self._release(key)
+        future.set_result(result)
+        return result
+
+    def _release(self, key: Hashable) -> None:
+        with self._lock:
+            del self._calls[key]
+            del self._waiters[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.leaders + self.coalesced
+            return {
+                "executions": self.leaders,
+                "coalesced": self.coalesced,
+                "coalesced_ratio": round(self.coalesced / total, 4) if total else 0.0,
+                "max_waiters": self.max_waiters,
+                "in_flight": len(self._calls)
+            }
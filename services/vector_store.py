@@ -0,0 +1,158 @@
+# services/vector_store.py
+# Pluggable vector-store backends: the managed Pinecone index and a local
+# memory-mapped index built from the same dataset texts.
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+
+from services.filters import FilterBitmaps, to_pinecone_filter
+
+DATA_FILE = "vietnam_travel_dataset.json"
+
+
+def node_text(node: Dict[str, Any]) -> str:
+    """Text that gets embedded for a node (same rule as pinecone_upload.py)."""
+    return node.get("semantic_text") or (node.get("description") or "")[:1000]
+
+
+def city_regions(nodes: List[Dict[str, Any]]) -> Dict[str, str]:
+    """City name -> region, taken from the City nodes."""
+    return {
+        node["name"]: node["region"]
+        for node in nodes
+        if node.get("type") == "City" and node.get("name") and node.get("region")
+    }
+
+
+def node_metadata(node: Dict[str, Any], regions: Dict[str, str] = None) -> Dict[str, Any]:
+    """Metadata stored alongside each vector.
+
+    Only City nodes carry a region in the dataset; other nodes inherit it
+    from their city through ``regions`` (see ``city_regions``).
+    """
+    city = node.get("city") or (node.get("name", "") if node.get("type") == "City" else "")
+    return {
+        "id": node.get("id"),
+        "type": node.get("type"),
+        "name": node.get("name"),
+        "city": city,
+        "region": node.get("region") or (regions or {}).get(city, ""),
+        "tags": node.get("tags", [])
+    }
+
+
+def dataset_items(nodes: List[Dict[str, Any]]) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """Return (id, semantic_text, metadata) triples for every embeddable node."""
+    regions = city_regions(nodes)
+    items = []
+    for node in nodes:
+        semantic_text = node_text(node)
+        if not semantic_text.strip():
+            continue
+        items.append((node["id"], semantic_text, node_metadata(node, regions)))
+    return items
+
+
+class PineconeVectorStore:
+    """Thin wrapper around a Pinecone index returning plain match dicts."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def query(self, vector: List[float], top_k: int, filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        kwargs = {}
+        pinecone_filter = to_pinecone_filter(filters)
+        if pinecone_filter:
+            kwargs["filter"] = pinecone_filter
+        res = self.index.query(
+            vector=vector,
+            top_k=top_k,
+            include_metadata=True,
+            include_values=False,
+            **kwargs
+        )
+        return res["matches"]
+
+    def query_many(self, vectors: List[List[float]], top_k: int, filters: Dict[str, Any] = None,
+                   max_workers: int = 8) -> List[List[Dict[str, Any]]]:
+        """One query per vector (Pinecone has no multi-vector query), issued concurrently."""
+        if len(vectors) <= 1:
+            return [self.query(v, top_k, filters=filters) for v in vectors]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(vectors))) as pool:
+            return list(pool.map(lambda v: self.query(v, top_k, filters=filters), vectors))
+
+
+class LocalVectorStore:
+    """In-process cosine search over a memory-mapped float32 matrix.
+
+    The index lives in a directory containing ``vectors.npy`` (N x D,
+    L2-normalised rows) and ``items.json`` (ids and metadata, row-aligned).
+    """
+
+    VECTORS_FILE = "vectors.npy"
+    ITEMS_FILE = "items.json"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.matrix = np.load(os.path.join(path, self.VECTORS_FILE), mmap_mode="r")
+        with open(os.path.join(path, self.ITEMS_FILE), "r", encoding="utf-8") as f:
+            items = json.load(f)
+        self.ids = [it["id"] for it in items]
+        self.metadata = [it["metadata"] for it in items]
+        if len(self.ids) != self.matrix.shape[0]:
+            raise ValueError(
+                f"Local index at {path} is inconsistent: "
+                f"{self.matrix.shape[0]} vectors but {len(self.ids)} items"
+            )
+        self.bitmaps = FilterBitmaps(self.metadata)
+
+    @classmethod
+    def build(cls, path: str, embedder, nodes: List[Dict[str, Any]], batch_size: int = 32) -> "LocalVectorStore":
+        """Embed the dataset and write a local index to ``path``."""
+        items = dataset_items(nodes)
+        texts = [text for _, text, _ in items]
+        vectors = embedder.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, cls.VECTORS_FILE), vectors)
+        with open(os.path.join(path, cls.ITEMS_FILE), "w", encoding="utf-8") as f:
+            json.dump([{"id": _id, "metadata": meta} for _id, _, meta in items], f, ensure_ascii=False)
+        return cls(path)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def query(self, vector: List[float], top_k: int, filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        return self.query_many([vector], top_k, filters=filters)[0]
+
+    def query_many(self, vectors: List[List[float]], top_k: int, filters: Dict[str, Any] = None) -> List[List[Dict[str, Any]]]:
+        """Score every query vector against the index in a single matrix product."""
+        q = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        mask = self.bitmaps.mask(filters)
+        if mask is None:
+            rows = None
+            scores = self.matrix @ q.T
+        else:
+            # score only the rows that pass the filter
+            rows = np.flatnonzero(mask)
+            scores = self.matrix[rows] @ q.T
+        k = min(top_k, scores.shape[0])
+        if k <= 0:
+            return [[] for _ in range(q.shape[0])]
+
+        results = []
+        for col in scores.T:
+            # argpartition is O(N); only the k winners get sorted
+            top = np.argpartition(-col, k - 1)[:k]
+            top = top[np.argsort(-col[top])]
+            ids = top if rows is None else rows[top]
+            results.append([
+                {"id": self.ids[i], "score": float(s), "metadata": self.metadata[i]}
+                for i, s in zip(ids, col[top])
+            ])
+        return results